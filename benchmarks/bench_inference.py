@@ -0,0 +1,265 @@
+# benchmarks/bench_inference.py
+"""Load test of the client classification API
+
+For each inference engine the client API (client/api.py) runs in its own
+process with a FederatedClient trained on local data; no federated server
+or network beyond localhost is needed. Requests are generated by a pool of
+threads, each with a keep-alive session, either as fast as responses come
+back or at a fixed total request rate. In the fixed-rate mode latency is
+measured from each request's scheduled send time, so a stalled server
+shows up in the tail latency instead of only lowering the request rate.
+
+Engines:
+- sklearn: the sklearn backend's model itself
+- numpy: the compiled NumPy copy of the sklearn model (the default)
+- tflite: an int8 TFLite export of a locally trained Keras model (needs
+  TensorFlow or tflite_runtime)
+
+Reports throughput, p50/p95/p99 latency and the API process's CPU use and
+RSS per engine and endpoint, and with --slo-p95-ms exits non-zero if any
+case misses the latency objective. The texts sent are the validation split
+of --data-dir (a directory of labeled client data), or of synthetic data if
+none is given; the prediction cache is off unless --cache is given.
+
+Usage:
+    python -m benchmarks.bench_inference [--engines sklearn numpy tflite] [--concurrency 8]
+        [--rate 200] [--duration 10] [--slo-p95-ms 50] [--output inference.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import itertools
+import tempfile
+import threading
+import numpy as np
+import requests
+
+from benchmarks.bench_round import free_port, git_commit, start_child
+from simulation.engine import load_client_data
+from simulation.synthetic_data import generate_client
+
+# Runs in the API process; the {placeholders} are filled in per engine
+API_PROCESS = """
+from client.client import FederatedClient
+from client import api
+from models.tflite_model import export_tflite, TFLiteTextClassifier
+
+# Nothing listens on the server URL; the model is trained locally
+client = FederatedClient('http://127.0.0.1:9', {data_dir!r}, client_id='loadtest',
+                         spool_dir={spool_dir!r}, model_backend={backend!r})
+client.train_local_model()
+if {engine!r} == 'tflite':
+    content = export_tflite(client.local_model, max_sequence_length=client.data_processor.max_sequence_length,
+                            vocab_size=client.data_processor.max_vocab_size)
+    client.publish_model(client.local_model, TFLiteTextClassifier(content))
+client.inference_engine = {engine!r}
+client.prediction_cache.max_entries = {cache_entries}
+api.app.config['MICRO_BATCHING'] = {micro_batching!r}
+api.run_client_api(client, host='127.0.0.1', port={port})
+"""
+
+# Model backend each engine runs on
+ENGINE_BACKENDS = {'sklearn': 'sklearn', 'numpy': 'sklearn', 'tflite': 'keras'}
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+def process_usage(pid):
+    """(CPU seconds, RSS MB, peak RSS MB) of a process, from /proc"""
+    try:
+        with open(f"/proc/{pid}/stat") as file:
+            # Fields after the command name, which may contain spaces
+            fields = file.read().rsplit(')', 1)[1].split()
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+        memory = {}
+        with open(f"/proc/{pid}/status") as file:
+            for line in file:
+                if line.startswith(('VmRSS:', 'VmHWM:')):
+                    name, value = line.split(':')
+                    memory[name] = int(value.split()[0]) / 1024.0
+        return cpu_seconds, memory.get('VmRSS'), memory.get('VmHWM')
+    except (OSError, IndexError, ValueError):
+        return None, None, None
+
+
+def run_load(url, make_payload, concurrency, rate, duration):
+    """Send requests for duration seconds; returns (latencies, errors, elapsed)
+
+    make_payload(n) builds the JSON body of the n-th request. With a rate
+    (requests per second over all threads) requests follow a fixed schedule
+    and latency counts from the scheduled time; without one every thread
+    sends its next request as soon as it has a response.
+    """
+    counter = itertools.count()
+    results = []
+    lock = threading.Lock()
+    started = time.perf_counter()
+    stop = started + duration
+
+    def worker():
+        session = requests.Session()
+        latencies = []
+        errors = 0
+        while True:
+            n = next(counter)
+            if rate:
+                scheduled = started + n / rate
+                if scheduled >= stop:
+                    break
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                scheduled = time.perf_counter()
+                if scheduled >= stop:
+                    break
+            try:
+                response = session.post(url, json=make_payload(n), timeout=30)
+                ok = response.status_code == 200
+            except requests.RequestException:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - scheduled)
+            else:
+                errors += 1
+        with lock:
+            results.append((latencies, errors))
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies = np.array([latency for thread_latencies, _ in results for latency in thread_latencies])
+    return latencies, sum(errors for _, errors in results), time.perf_counter() - started
+
+
+def run_engine(engine, data_dir, texts, args, work_dir):
+    """Load test every endpoint of one engine's API process"""
+    port = free_port()
+    code = API_PROCESS.format(
+        data_dir=data_dir,
+        spool_dir=os.path.join(work_dir, 'spool'),
+        backend=ENGINE_BACKENDS[engine],
+        engine=engine,
+        cache_entries=10000 if args.cache else 0,
+        micro_batching=not args.no_micro_batching,
+        port=port
+    )
+    process, base_url = start_child(code, work_dir, port, timeout=args.startup_timeout)
+
+    payloads = {
+        'classify': lambda n: {'text': texts[n % len(texts)]},
+        'classify_batch': lambda n: {
+            'texts': [texts[(n * args.batch_size + i) % len(texts)] for i in range(args.batch_size)]
+        }
+    }
+    results = []
+    try:
+        for endpoint in args.endpoints:
+            url = f"{base_url}/{endpoint}"
+            run_load(url, payloads[endpoint], args.concurrency, None, args.warmup)
+
+            cpu_before = process_usage(process.pid)[0]
+            latencies, errors, elapsed = run_load(url, payloads[endpoint], args.concurrency, args.rate, args.duration)
+            cpu_after, rss_mb, peak_rss_mb = process_usage(process.pid)
+
+            texts_per_request = args.batch_size if endpoint == 'classify_batch' else 1
+            result = {
+                'engine': engine,
+                'endpoint': endpoint,
+                'requests': len(latencies),
+                'errors': errors,
+                'throughput_rps': len(latencies) / elapsed,
+                'texts_per_second': len(latencies) * texts_per_request / elapsed,
+                'cpu_percent': (100.0 * (cpu_after - cpu_before) / elapsed) if cpu_before is not None else None,
+                'rss_mb': rss_mb,
+                'peak_rss_mb': peak_rss_mb
+            }
+            for name, q in (('p50_ms', 50), ('p95_ms', 95), ('p99_ms', 99)):
+                result[name] = float(np.percentile(latencies, q) * 1000) if len(latencies) else None
+            results.append(result)
+    finally:
+        process.terminate()
+        process.wait()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the client classification API')
+    parser.add_argument('--engines', nargs='+', choices=sorted(ENGINE_BACKENDS), default=['sklearn', 'numpy', 'tflite'],
+                        help='Inference engines to compare')
+    parser.add_argument('--endpoints', nargs='+', choices=['classify', 'classify_batch'],
+                        default=['classify', 'classify_batch'], help='Endpoints to load')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent connections')
+    parser.add_argument('--rate', type=float, help='Requests per second over all connections (default: unthrottled)')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per endpoint')
+    parser.add_argument('--warmup', type=float, default=2.0, help='Unmeasured seconds before each endpoint')
+    parser.add_argument('--batch-size', type=int, default=32, help='Texts per /classify_batch request')
+    parser.add_argument('--data-dir', help='Labeled client data to train on and take texts from '
+                                           '(default: synthetic data)')
+    parser.add_argument('--cache', action='store_true', help='Keep the prediction cache enabled')
+    parser.add_argument('--no-micro-batching', action='store_true', help='Disable /classify micro-batching')
+    parser.add_argument('--slo-p95-ms', type=float, help='Fail if a case has a higher p95 latency')
+    parser.add_argument('--startup-timeout', type=float, default=300.0, help='Seconds to wait for each API process')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    results = []
+    failures = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_dir = args.data_dir
+        if data_dir is None:
+            data_dir = os.path.join(work_dir, 'data')
+            generate_client(data_dir, 5000, seed=0, alpha=10.0)
+        _, _, texts, _ = load_client_data(data_dir)
+        if not texts:
+            print(f"No labeled texts in {data_dir}")
+            return 1
+
+        print(f"{'engine':>8} {'endpoint':>15} {'req/s':>8} {'texts/s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+              f"{'p99 ms':>8} {'cpu %':>6} {'rss MB':>7} {'errors':>6}")
+        for engine in args.engines:
+            engine_dir = os.path.join(work_dir, engine)
+            os.makedirs(engine_dir)
+            try:
+                engine_results = run_engine(engine, data_dir, texts, args, engine_dir)
+            except RuntimeError as e:
+                print(f"{engine:>8} failed to start: {str(e).strip().splitlines()[-1]}")
+                results.append({'engine': engine, 'error': str(e)})
+                failures.append(f"{engine} did not start")
+                continue
+
+            for result in engine_results:
+                results.append(result)
+                print(f"{engine:>8} {result['endpoint']:>15} {result['throughput_rps']:>8.1f} "
+                      f"{result['texts_per_second']:>9.1f} {result['p50_ms'] or 0:>8.2f} {result['p95_ms'] or 0:>8.2f} "
+                      f"{result['p99_ms'] or 0:>8.2f} {result['cpu_percent'] or 0:>6.1f} "
+                      f"{result['rss_mb'] or 0:>7.1f} {result['errors']:>6}")
+                if result['errors']:
+                    failures.append(f"{engine} {result['endpoint']}: {result['errors']} failed requests")
+                if args.slo_p95_ms is not None and (result['p95_ms'] is None or result['p95_ms'] > args.slo_p95_ms):
+                    p95 = 'n/a' if result['p95_ms'] is None else f"{result['p95_ms']:.2f}"
+                    failures.append(f"{engine} {result['endpoint']}: p95 {p95} ms exceeds {args.slo_p95_ms} ms")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({
+                'commit': git_commit(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'settings': {key: value for key, value in vars(args).items() if key != 'output'},
+                'results': results
+            }, file, indent=2)
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,313 @@
+# benchmarks/bench_round.py
+"""End-to-end federated round benchmark
+
+For every combination of client count, feature dimension (vocabulary size
+of the sklearn model) and wire format, a stand-in server runs in its own
+process: a real FederatedServer and its Flask app on a local port, with its
+global model bootstrapped to the requested dimension and one extra route
+that aggregates synchronously and reports timing and peak RSS. Real
+FederatedClients on synthetic data then run training cycles against it
+over HTTP (model fetch, local fit, encoded chunked upload), and the round
+is closed by aggregating on the server.
+
+Per configuration it reports round wall time, client cycle time,
+aggregation time, bytes up and down (counted on the wire), server peak RSS,
+and the encode/decode cost of one update and of the JSON model download.
+Results are written as JSON together with the git commit, so runs on
+different commits can be compared.
+
+Usage:
+    python -m benchmarks.bench_round [--clients 10 50] [--features 1000 4000]
+        [--wire-dtypes float32 float16] [--rounds 3] [--output rounds.json]
+"""
+import os
+import io
+import sys
+import json
+import time
+import socket
+import warnings
+import argparse
+import platform
+import tempfile
+import threading
+import contextlib
+import subprocess
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from sklearn.exceptions import ConvergenceWarning
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from client.client import FederatedClient
+from simulation.synthetic_data import generate
+from utils.communication import WIRE_DTYPES, encode_update, decode_update, to_param_dtype, get_transport
+
+# Runs in the stand-in server process; the {placeholders} are filled in per
+# configuration
+STANDIN_SERVER = """
+import time, resource
+from flask import jsonify
+from server import server as server_module
+from server.server import FederatedServer, app
+from models.simple_classifier import SimpleTextClassifier
+from simulation.engine import load_client_data
+from utils.communication import weights_fingerprint
+
+server = FederatedServer(model_path={model_path!r}, model_backend='sklearn')
+server.global_model = SimpleTextClassifier(max_features={feature_dim})
+texts, labels = [], []
+for data_dir in {bootstrap_dirs!r}:
+    train_texts, train_labels, _, _ = load_client_data(data_dir)
+    texts.extend(train_texts)
+    labels.extend(train_labels)
+server.global_model.fit(texts, labels)
+server.model_hash = weights_fingerprint(server.global_model.get_weights())
+server_module._server = server
+
+@app.route('/bench/aggregate', methods=['POST'])
+def bench_aggregate():
+    received = len(server.client_updates)
+    started = time.perf_counter()
+    averaged = server.aggregate_models()
+    return jsonify({{
+        'seconds': time.perf_counter() - started,
+        'received': received,
+        'averaged': averaged,
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    }})
+
+@app.route('/bench/info', methods=['GET'])
+def bench_info():
+    return jsonify({{
+        'feature_dim': int(server.global_model.get_weights()[0].shape[1]),
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    }})
+
+app.run(host='127.0.0.1', port={port}, threaded=True)
+"""
+
+
+class ByteCounter:
+    """Counts request and response body bytes of a requests session"""
+
+    def __init__(self, session):
+        self.lock = threading.Lock()
+        self.reset()
+        session.hooks['response'].append(self._count)
+
+    def reset(self):
+        with self.lock:
+            self.up = 0
+            self.down = 0
+
+    def _count(self, response, *args, **kwargs):
+        body = response.request.body
+        with self.lock:
+            self.up += len(body) if body else 0
+            self.down += len(response.content)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_child(code, work_dir, port, timeout=60):
+    """Run code in a new interpreter and wait until it listens on port
+
+    Returns (process, base_url); output goes to work_dir/child.log, whose
+    tail is raised if the process exits or times out before listening.
+    """
+    log_path = os.path.join(work_dir, 'child.log')
+    with open(log_path, 'w') as log:
+        process = subprocess.Popen(
+            [sys.executable, '-c', code], cwd=work_dir, stdout=log, stderr=subprocess.STDOUT,
+            env=dict(os.environ, PYTHONPATH=REPO_ROOT, TF_CPP_MIN_LOG_LEVEL='3')
+        )
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            break
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.1)
+
+    process.kill()
+    with open(log_path) as log:
+        raise RuntimeError(f"Child process did not start listening:\n{log.read()[-2000:]}")
+
+
+def start_standin_server(work_dir, feature_dim, bootstrap_dirs):
+    """Start a stand-in server process; returns (process, base_url)"""
+    port = free_port()
+    code = STANDIN_SERVER.format(
+        model_path=os.path.join(work_dir, 'server', 'global_model'),
+        feature_dim=feature_dim,
+        bootstrap_dirs=bootstrap_dirs,
+        port=port
+    )
+    return start_child(code, work_dir, port)
+
+
+def time_call(func, repeat):
+    """Median seconds of repeat calls to func"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def codec_costs(weights, wire_dtype, repeat=5):
+    """Encode/decode seconds of one update and of the JSON model download"""
+    blob = encode_update(weights, {'metrics': {'accuracy': 0.5}}, wire_dtype=wire_dtype)
+    document = json.dumps({'weights': [w.tolist() for w in weights]})
+    return {
+        'update_bytes': len(blob),
+        'encode_seconds': time_call(lambda: encode_update(weights, {'metrics': {}}, wire_dtype=wire_dtype), repeat),
+        'decode_seconds': time_call(lambda: decode_update(blob), repeat),
+        'model_json_bytes': len(document),
+        'model_json_encode_seconds': time_call(lambda: json.dumps({'weights': [w.tolist() for w in weights]}), repeat),
+        'model_json_decode_seconds': time_call(
+            lambda: to_param_dtype(np.array(w) for w in json.loads(document)['weights']), repeat
+        )
+    }
+
+
+def run_config(client_dirs, num_clients, feature_dim, wire_dtype, rounds, concurrency, work_dir):
+    """Benchmark one configuration and return its measurements"""
+    os.makedirs(work_dir, exist_ok=True)
+    process, base_url = start_standin_server(work_dir, feature_dim, client_dirs[:20])
+    try:
+        transport = get_transport(base_url)
+        counter = ByteCounter(transport.session)
+
+        # Client output would swamp the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            clients = [
+                FederatedClient(
+                    base_url, client_dirs[i % len(client_dirs)], client_id=f"bench{i:05d}",
+                    spool_dir=os.path.join(work_dir, 'spool', str(i)), wire_dtype=wire_dtype
+                )
+                for i in range(num_clients)
+            ]
+
+        round_results = []
+        for round_index in range(rounds):
+            counter.reset()
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=concurrency) as pool:
+                list(pool.map(lambda client: client.run_training_cycle(), clients))
+            clients_seconds = time.perf_counter() - started
+            bytes_up, bytes_down = counter.up, counter.down
+
+            aggregate = transport.post('/bench/aggregate', retry=False).json()
+            round_results.append({
+                'round': round_index,
+                'round_seconds': time.perf_counter() - started,
+                'clients_seconds': clients_seconds,
+                'aggregate_seconds': aggregate['seconds'],
+                'updates_received': aggregate['received'],
+                'updates_averaged': aggregate['averaged'],
+                'bytes_up': bytes_up,
+                'bytes_down': bytes_down
+            })
+
+        info = transport.get('/bench/info', retry=False).json()
+        weights = clients[0].transport.fetch_model()['weights']
+    finally:
+        process.terminate()
+        process.wait()
+
+    def median(key):
+        return statistics.median(result[key] for result in round_results)
+
+    return {
+        'num_clients': num_clients,
+        'feature_dim': info['feature_dim'],
+        'requested_feature_dim': feature_dim,
+        'wire_dtype': wire_dtype,
+        'round_seconds': median('round_seconds'),
+        'aggregate_seconds': median('aggregate_seconds'),
+        'bytes_up_per_round': median('bytes_up'),
+        'bytes_down_per_round': median('bytes_down'),
+        'server_max_rss_mb': info['max_rss_mb'],
+        'codec': codec_costs(weights, wire_dtype),
+        'rounds': round_results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark complete federated rounds')
+    parser.add_argument('--clients', type=int, nargs='+', default=[10, 50], help='Client counts')
+    parser.add_argument('--features', type=int, nargs='+', default=[1000, 4000],
+                        help='Feature dimensions (vocabulary sizes) of the model')
+    parser.add_argument('--wire-dtypes', nargs='+', choices=sorted(WIRE_DTYPES), default=['float32', 'float16'],
+                        help='Wire formats of the uploaded updates')
+    parser.add_argument('--rounds', type=int, default=3, help='Rounds per configuration (median is reported)')
+    parser.add_argument('--examples-per-client', type=int, default=200, help='Synthetic examples per client')
+    parser.add_argument('--concurrency', type=int, default=8, help='Clients running a cycle at the same time')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    # Capped warm-start fits in client threads, expected not to converge
+    warnings.filterwarnings('ignore', category=ConvergenceWarning)
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_dir = os.path.join(work_dir, 'data')
+        num_dirs = max(args.clients)
+        generate(data_dir, num_dirs, num_dirs * args.examples_per_client, quantity_sigma=0.0)
+        client_dirs = sorted(
+            os.path.join(data_dir, name) for name in os.listdir(data_dir)
+            if os.path.isdir(os.path.join(data_dir, name))
+        )
+
+        print(f"{'clients':>8} {'features':>8} {'wire':>8} {'round s':>8} {'agg ms':>8} "
+              f"{'up kB':>9} {'down kB':>9} {'enc ms':>7} {'dec ms':>7} {'rss MB':>7}")
+        for num_clients in args.clients:
+            for feature_dim in args.features:
+                for wire_dtype in args.wire_dtypes:
+                    name = f"{num_clients}_{feature_dim}_{wire_dtype}"
+                    result = run_config(
+                        client_dirs, num_clients, feature_dim, wire_dtype, args.rounds, args.concurrency,
+                        os.path.join(work_dir, name)
+                    )
+                    results.append(result)
+                    print(f"{num_clients:>8} {result['feature_dim']:>8} {wire_dtype:>8} "
+                          f"{result['round_seconds']:>8.2f} {result['aggregate_seconds'] * 1000:>8.1f} "
+                          f"{result['bytes_up_per_round'] / 1000:>9.1f} {result['bytes_down_per_round'] / 1000:>9.1f} "
+                          f"{result['codec']['encode_seconds'] * 1000:>7.2f} "
+                          f"{result['codec']['decode_seconds'] * 1000:>7.2f} {result['server_max_rss_mb']:>7.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({
+                'commit': git_commit(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'results': results
+            }, file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
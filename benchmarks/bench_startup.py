@@ -0,0 +1,103 @@
+# benchmarks/bench_startup.py
+"""Cold-start benchmark for the entry points
+
+Every measurement runs in a fresh interpreter, so nothing is already
+imported. Reports import and construction time, peak RSS and whether
+TensorFlow got loaded, and exits non-zero if the default (sklearn) backend
+pulls in TensorFlow or a step exceeds its time budget.
+
+Usage:
+    python -m benchmarks.bench_startup [--repeat 3] [--budget 5.0] [--output startup.json]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+import statistics
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child interpreter; {setup} and {statement} are filled in per case
+CHILD_TEMPLATE = """
+import sys, time, json, resource
+{setup}
+started = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    'seconds': elapsed,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+    'tensorflow_loaded': 'tensorflow' in sys.modules
+}}))
+"""
+
+# name -> (setup, statement); setup is not timed
+CASES = {
+    'import main': ('', 'import main'),
+    'import client.client': ('', 'import client.client'),
+    'import server.server': ('', 'import server.server'),
+    'import client.api': ('', 'import client.api'),
+    'FederatedClient()': (
+        'import tempfile\nfrom client.client import FederatedClient\ndata_dir = tempfile.mkdtemp()',
+        "FederatedClient('http://localhost:5000', data_dir, client_id='bench')"
+    ),
+    'get_server()': (
+        'import os, tempfile\nos.chdir(tempfile.mkdtemp())\nfrom server.server import get_server',
+        'get_server()'
+    ),
+}
+
+
+def run_case(setup, statement, backend):
+    """Run one case in a fresh interpreter and return its measurements"""
+    env = dict(os.environ, FL_MODEL_BACKEND=backend, PYTHONPATH=REPO_ROOT)
+    # Keep TensorFlow quiet if a Keras backend loads it
+    env.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD_TEMPLATE.format(setup=setup, statement=statement)],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else 'child failed')
+    # The last line is the measurement, anything before it is program output
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure cold-start cost of the entry points')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per case (median is reported)')
+    parser.add_argument('--budget', type=float, default=5.0, help='Seconds allowed per case')
+    parser.add_argument('--backend', default='sklearn', help='Model backend to start with')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    results = {}
+    failures = []
+    for name, (setup, statement) in CASES.items():
+        runs = [run_case(setup, statement, args.backend) for _ in range(args.repeat)]
+        seconds = statistics.median(run['seconds'] for run in runs)
+        results[name] = {
+            'seconds': seconds,
+            'max_rss_mb': max(run['max_rss_mb'] for run in runs),
+            'tensorflow_loaded': any(run['tensorflow_loaded'] for run in runs)
+        }
+        print(f"{name:24s} {seconds:7.3f}s  {results[name]['max_rss_mb']:7.1f} MB  "
+              f"tensorflow={'yes' if results[name]['tensorflow_loaded'] else 'no'}")
+
+        if seconds > args.budget:
+            failures.append(f"{name} took {seconds:.3f}s (budget {args.budget:.3f}s)")
+        if args.backend == 'sklearn' and results[name]['tensorflow_loaded']:
+            failures.append(f"{name} imported TensorFlow with the sklearn backend")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'backend': args.backend, 'budget': args.budget, 'results': results}, file, indent=2)
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,12 +1,43 @@
 # client/api.py
-from flask import Flask, request, jsonify
+import threading
+import numpy as np
+from flask import Flask, Response, request, jsonify
 from client.client import FederatedClient
+from client.batching import MicroBatcher
+from utils import instrumentation
 
 # Initialize Flask app
 app = Flask(__name__)
 
+# Largest number of texts accepted by /classify_batch
+app.config['MAX_BATCH_SIZE'] = 512
+
+# Coalesce concurrent /classify requests into micro-batches
+app.config['MICRO_BATCHING'] = True
+app.config['MICRO_BATCH_SIZE'] = 32
+app.config['MICRO_BATCH_WAIT_MS'] = 5.0
+
+# Latency of classification requests as seen by the API, exported on /metrics
+REQUEST_SECONDS = instrumentation.histogram('fl_api_request_seconds', 'Latency of classification requests',
+                                            ['endpoint'])
+
 # Global client instance
 client = None
+batcher = None
+batcher_lock = threading.Lock()
+
+def get_batcher():
+    """Return the /classify micro-batcher, creating it on first use"""
+    global batcher
+    if batcher is None and app.config['MICRO_BATCHING']:
+        with batcher_lock:
+            if batcher is None:
+                batcher = MicroBatcher(
+                    lambda texts: client.classify_texts(texts),
+                    max_batch_size=app.config['MICRO_BATCH_SIZE'],
+                    max_wait_ms=app.config['MICRO_BATCH_WAIT_MS']
+                )
+    return batcher
 
 @app.route('/classify', methods=['POST'])
 def classify_text():
@@ -19,10 +50,48 @@ def classify_text():
         return jsonify({'error': 'No text provided'}), 400
     
     text = data['text']
-    result = client.classify_text(text)
+    if not isinstance(text, str):
+        return jsonify({'error': 'Text must be a string'}), 400
+    with REQUEST_SECONDS.time(endpoint='classify'):
+        micro_batcher = get_batcher()
+        if micro_batcher is not None:
+            result = micro_batcher.submit(text)
+        else:
+            result = client.classify_text(text)
     
     return jsonify(result)
 
+@app.route('/classify_batch', methods=['POST'])
+def classify_batch():
+    """Endpoint to classify a list of texts in one vectorized pass
+    
+    Returns class ids and per-class probabilities as compact arrays; the
+    class names are sent once.
+    """
+    if not client:
+        return jsonify({'error': 'Client not initialized'}), 500
+    
+    data = request.json
+    if not data or not isinstance(data.get('texts'), list):
+        return jsonify({'error': 'No texts provided'}), 400
+    
+    texts = data['texts']
+    if not all(isinstance(text, str) for text in texts):
+        return jsonify({'error': 'All texts must be strings'}), 400
+    
+    max_batch_size = app.config['MAX_BATCH_SIZE']
+    if len(texts) > max_batch_size:
+        return jsonify({'error': f"Batch too large, at most {max_batch_size} texts allowed"}), 413
+    
+    with REQUEST_SECONDS.time(endpoint='classify_batch'):
+        class_ids, probabilities = client.classify_batch(texts)
+    
+    return jsonify({
+        'class_names': client.data_processor.get_class_names(),
+        'class_ids': class_ids.tolist(),
+        'probabilities': np.round(probabilities, 4).tolist()
+    })
+
 @app.route('/status', methods=['GET'])
 def get_status():
     """Return the client's status"""
@@ -32,13 +101,26 @@ def get_status():
     return jsonify({
         'client_id': client.client_id,
         'status': 'active',
-        'server_url': client.server_url
+        'server_url': client.server_url,
+        'model_version': client.model_version,
+        'prediction_cache': client.prediction_cache.stats(),
+        'micro_batching': batcher.stats() if batcher is not None else None,
+        'transport': client.transport.stats()
     })
 
-def run_client_api(client_instance, host='0.0.0.0', port=5001):
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Per-stage timings and counters in the Prometheus text format"""
+    if not instrumentation.enabled():
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(instrumentation.render(), content_type=instrumentation.CONTENT_TYPE)
+
+def run_client_api(client_instance, host='0.0.0.0', port=5001, max_batch_size=None):
     """Run the client API server"""
     global client
     client = client_instance
+    if max_batch_size is not None:
+        app.config['MAX_BATCH_SIZE'] = max_batch_size
     app.run(host=host, port=port, debug=False)
 
 if __name__ == '__main__':
@@ -0,0 +1,120 @@
+# client/batching.py
+import time
+import queue
+import threading
+
+class _PendingRequest:
+    """A single queued item waiting for its batch to be processed"""
+
+    __slots__ = ('item', 'enqueued_at', 'done', 'result', 'error')
+
+    def __init__(self, item):
+        self.item = item
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class MicroBatcher:
+    """Coalesces concurrent single-item requests into micro-batches
+
+    Callers block in submit() while a worker thread collects queued items
+    until max_batch_size items are waiting or the oldest has waited
+    max_wait_ms, runs batch_fn once on the whole batch and hands each caller
+    its own result. batch_fn takes a list of items and returns a list of
+    results in the same order. If it raises, the items are run again one
+    by one, so only the callers whose item fails get the error.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=32, max_wait_ms=5.0):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = queue.Queue()
+
+        # Statistics
+        self.lock = threading.Lock()
+        self.num_batches = 0
+        self.num_items = 0
+        self.max_batch_seen = 0
+        self.total_queue_wait = 0.0
+        self.max_queue_wait = 0.0
+        self.batch_size_counts = {}
+
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    def submit(self, item, timeout=None):
+        """Queue an item and block until its result is available"""
+        pending = _PendingRequest(item)
+        self.queue.put(pending)
+        if not pending.done.wait(timeout):
+            raise TimeoutError('Timed out waiting for batch result')
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _collect(self):
+        """Block for the first item, then gather more until full or due"""
+        batch = [self.queue.get()]
+        deadline = batch[0].enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    batch.append(self.queue.get(timeout=remaining))
+                else:
+                    # Past the deadline: take only what is already waiting
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started_at = time.perf_counter()
+
+            try:
+                results = self.batch_fn([pending.item for pending in batch])
+                for pending, result in zip(batch, results):
+                    pending.result = result
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0].error = e
+                else:
+                    # Retry one at a time, so a bad item only fails its own
+                    # request and not the others it was batched with
+                    for pending in batch:
+                        try:
+                            pending.result = self.batch_fn([pending.item])[0]
+                        except Exception as item_error:
+                            pending.error = item_error
+
+            self._record(batch, started_at)
+            for pending in batch:
+                pending.done.set()
+
+    def _record(self, batch, started_at):
+        waits = [started_at - pending.enqueued_at for pending in batch]
+        with self.lock:
+            self.num_batches += 1
+            self.num_items += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            self.total_queue_wait += sum(waits)
+            self.max_queue_wait = max(self.max_queue_wait, max(waits))
+            self.batch_size_counts[len(batch)] = self.batch_size_counts.get(len(batch), 0) + 1
+
+    def stats(self):
+        """Batch size and queue wait statistics"""
+        with self.lock:
+            return {
+                'batches': self.num_batches,
+                'requests': self.num_items,
+                'avg_batch_size': self.num_items / self.num_batches if self.num_batches else 0.0,
+                'max_batch_size': self.max_batch_seen,
+                'avg_queue_wait_ms': 1000.0 * self.total_queue_wait / self.num_items if self.num_items else 0.0,
+                'max_queue_wait_ms': 1000.0 * self.max_queue_wait,
+                'batch_size_counts': dict(sorted(self.batch_size_counts.items())),
+                'queue_depth': self.queue.qsize()
+            }
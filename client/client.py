@@ -1,105 +1,425 @@
 # client/client.py
 import os
+import copy
 import json
 import time
 import uuid
+import threading
+from collections import namedtuple
 import numpy as np
 import requests
-import tensorflow as tf
-from models.text_classifier import create_model
+from models.text_classifier import create_model, resolve_backend, uses_token_sequences
+from models.simple_classifier import SimpleTextClassifier
+from models.numpy_inference import CompiledTextClassifier
+from models.tflite_model import TFLiteTextClassifier
 from client.data_processor import TextDataProcessor
+from client.update_spool import UpdateSpool
+from client.prediction_cache import PredictionCache
+from client.transport import HttpServerTransport
+from utils import instrumentation
+from utils.instrumentation import CLIENT_STAGE_SECONDS
+from utils.communication import weights_delta
+
+CLASSIFIED_TEXTS = instrumentation.counter('fl_client_classified_texts_total', 'Texts classified by the local model')
+
+# An immutable published model: inference reads one of these through a single
+# attribute lookup while training works on a separate instance
+ModelSnapshot = namedtuple('ModelSnapshot', ['model', 'version', 'compiled'])
 
 class FederatedClient:
-    def __init__(self, server_url, data_source_path, client_id=None):
+    def __init__(self, server_url, data_source_path, client_id=None, spool_dir=None, model_backend=None,
+                 wire_dtype='float32', transport=None):
         # Unique identifier for this client
         self.client_id = client_id or str(uuid.uuid4())[:8]
         self.server_url = server_url
+        # How the global model is fetched and updates are submitted; HTTP
+        # unless e.g. an InProcessTransport to a co-located server is given
+        self.transport = transport or HttpServerTransport(server_url, wire_dtype=wire_dtype)
         
         # Initialize local model
-        self.local_model = create_model()
+        self.model_backend = resolve_backend(model_backend)
+        self._publish_lock = threading.Lock()
+        self._snapshot = ModelSnapshot(None, 0, None)
+        self.local_model = create_model(backend=self.model_backend)
         
         # Setup data processor
         self.data_processor = TextDataProcessor(data_source_path)
         
-        # Training config
-        self.local_epochs = 3
+        # Training config; local_epochs is an upper bound (None means the
+        # model's own default) and is lowered to fit the round's time budget
+        self.local_epochs = None if self.model_backend == 'sklearn' else 3
         self.batch_size = 32
+        self.min_local_epochs = 1
+        self.min_sample_size = 32
+        self.budget_safety_factor = 0.8
+        
+        # Measured training throughput in example-epochs per second and the
+        # time budget (seconds) the server gives for local training
+        self.throughput = None
+        self.round_time_budget = None
+        self.last_work = None
+        
+        # Incremental training: after the first cycle, train only on files
+        # added since the last cycle plus a replay sample of older examples
+        self.incremental_training = False
+        self.replay_size = 200
+        self._trained_sources = set()
+        
+        # (round, model hash, corpus fingerprint) of the last submitted update,
+        # used to skip cycles where nothing has changed
+        self.global_model_hash = None
+        self._last_fingerprint = None
+        
+        # Updates that could not be submitted wait on disk for the link to return
+        self.global_round = None
+        # Weights of the global model of global_round; spooled updates are
+        # stored relative to them
+        self.global_weights = None
+        # Precision of weights in uploaded updates (a WIRE_DTYPES key)
+        self.wire_dtype = wire_dtype
+        self.spool = UpdateSpool(spool_dir or os.path.join(data_source_path, '.spool'), wire_dtype=wire_dtype)
+        
+        # Cached predictions are tagged with the model version and the
+        # inference engine that computed them
+        self.prediction_cache = PredictionCache(max_entries=10000)
+        
+        # Inference engine. sklearn backend: 'numpy' runs predictions on a
+        # compiled copy of the model without sklearn overhead, 'sklearn' uses
+        # the model itself. Keras backends: 'tflite' runs the server's int8
+        # TFLite export of the global model, 'keras' the Keras model.
+        self.inference_engine = 'numpy' if self.model_backend == 'sklearn' else 'tflite'
         
         print(f"Client {self.client_id} initialized")
     
+    @property
+    def local_model(self):
+        """The currently published model; never modified in place"""
+        return self._snapshot.model
+    
+    @local_model.setter
+    def local_model(self, model):
+        self.publish_model(model)
+    
+    @property
+    def model_version(self):
+        """Version of the published model, bumped on every swap"""
+        return self._snapshot.version
+    
+    def publish_model(self, model, compiled=None):
+        """Atomically replace the model used for inference
+        
+        The compiled inference copy is built here, on the training side, so
+        readers only ever see a complete snapshot. The model must not be
+        modified after it has been published. Keras models have no local
+        compiled form; they keep the last TFLite export of the global model
+        unless a new one is passed in.
+        """
+        if compiled is None:
+            if isinstance(model, SimpleTextClassifier):
+                compiled = CompiledTextClassifier.from_classifier(model)
+            else:
+                compiled = self._snapshot.compiled
+        
+        with self._publish_lock:
+            self._snapshot = ModelSnapshot(model, self._snapshot.version + 1, compiled)
+    
+    def _clone_model(self):
+        """Private working copy of the published model for training or loading weights"""
+        model = self.local_model
+        if isinstance(model, SimpleTextClassifier):
+            return copy.deepcopy(model)
+        
+        clone = create_model(backend=self.model_backend)
+        clone.set_weights(model.get_weights())
+        return clone
+    
     def get_global_model(self):
         """Fetch the latest global model from the server"""
         try:
-            response = requests.get(f"{self.server_url}/get_model")
-            if response.status_code == 200:
-                data = response.json()
-                
-                # Convert lists back to numpy arrays
-                weights = [np.array(w) for w in data['weights']]
-                
-                # Update local model
-                self.local_model.set_weights(weights)
+            data = self.transport.fetch_model()
+            if data is not None:
+                # Load into a new instance and swap it in
+                model = self._clone_model()
+                model.set_weights(data['weights'])
+                compiled = None
+                if self.inference_engine == 'tflite':
+                    compiled = self.fetch_tflite_model()
+                self.publish_model(model, compiled)
+                self.global_model_hash = data.get('model_hash')
+                self.round_time_budget = data.get('time_budget')
+                self.global_round = data['round']
+                self.global_weights = data['weights']
                 return data['round']
-            else:
-                print(f"Error fetching model: {response.text}")
-                return None
+            return None
         except Exception as e:
             print(f"Error connecting to server: {e}")
             return None
     
+    def fetch_tflite_model(self):
+        """Download the server's int8 TFLite export of the global model"""
+        try:
+            content = self.transport.fetch_tflite()
+            if content is not None:
+                return TFLiteTextClassifier(content)
+        except Exception as e:
+            print(f"Error fetching TFLite model: {e}")
+        return None
+    
+    def _model_inputs(self, model, texts):
+        """Convert texts to the input format the model expects"""
+        if uses_token_sequences(model):
+            return self.data_processor.texts_to_sequences(texts)
+        return texts
+    
+    def get_server_status(self):
+        """Fetch the server's current round and global model hash"""
+        try:
+            return self.transport.get_status()
+        except Exception as e:
+            print(f"Error connecting to server: {e}")
+            return None
+    
+    def send_heartbeat(self, round_num):
+        """Tell the server our update for this round still stands"""
+        try:
+            return self.transport.heartbeat(self.client_id, round_num)
+        except Exception as e:
+            print(f"Error sending heartbeat: {e}")
+            return None
+    
+    def plan_local_work(self, num_examples, time_budget=None):
+        """Choose the number of epochs and examples that fit in the time budget
+        
+        Returns (epochs, sample_size). Without a budget or a throughput
+        measurement the full default amount of work is planned.
+        """
+        if not time_budget or not self.throughput or num_examples == 0:
+            return self.local_epochs, num_examples
+        
+        # Example-epochs we can afford, keeping a margin for evaluation/upload
+        capacity = self.throughput * time_budget * self.budget_safety_factor
+        
+        epochs = int(capacity // num_examples)
+        if epochs >= self.min_local_epochs:
+            if self.local_epochs is not None:
+                epochs = min(epochs, self.local_epochs)
+            return epochs, num_examples
+        
+        # Not even the minimum number of epochs fits: train on a subsample
+        sample_size = max(self.min_sample_size, int(capacity // self.min_local_epochs))
+        return self.min_local_epochs, min(sample_size, num_examples)
+    
+    def _fit(self, model, X_train, y_train, epochs, full_split):
+        """Fit a model on training texts
+        
+        Keras models are fed through a tf.data pipeline of pre-tokenized
+        sequences; when training on the whole training split, its tokens come
+        from the processor's on-disk cache.
+        """
+        if not uses_token_sequences(model):
+            return model.fit(
+                X_train, y_train,
+                epochs=epochs,
+                batch_size=self.batch_size,
+                verbose=1
+            )
+        
+        if full_split:
+            dataset = self.data_processor.get_token_dataset('train', batch_size=self.batch_size)
+        else:
+            flat, lengths = self.data_processor.tokenize_ragged(X_train)
+            dataset = self.data_processor.build_token_dataset(
+                flat, lengths, np.asarray(y_train, dtype=np.int32), batch_size=self.batch_size
+            )
+        return model.fit(dataset, epochs=epochs, verbose=1)
+    
+    def _evaluate(self, model):
+        """Validation metrics of a model as a dict, or None if there is no validation split"""
+        if uses_token_sequences(model):
+            _, _, y_val = self.data_processor.get_tokenized_split('validation')
+            if len(y_val) == 0:
+                return None
+            dataset = self.data_processor.get_token_dataset('validation', batch_size=self.batch_size)
+            return model.evaluate(dataset, verbose=0, return_dict=True)
+        
+        X_val, y_val = self.data_processor.get_validation_data()
+        if len(X_val) == 0:
+            return None
+        return model.evaluate(X_val, y_val, verbose=0, return_dict=True)
+    
     def train_local_model(self):
         """Train the local model on client data"""
-        # Get training data
-        X_train, y_train = self.data_processor.get_training_data()
-        
-        # Train the model
-        history = self.local_model.fit(
-            X_train, y_train,
-            epochs=self.local_epochs,
-            batch_size=self.batch_size,
-            verbose=1
+        # Get training data (everything, unless training incrementally)
+        seen_sources = self._trained_sources if self.incremental_training else set()
+        X_train, y_train, sources = self.data_processor.get_incremental_training_data(
+            seen_sources, replay_size=self.replay_size
         )
         
-        # Evaluate model on local validation data
-        X_val, y_val = self.data_processor.get_validation_data()
-        eval_results = self.local_model.evaluate(X_val, y_val, verbose=0)
-        
-        # Return metrics from last epoch
         metrics = {}
-        for metric_name, metric_value in zip(self.local_model.metrics_names, eval_results):
-            metrics[metric_name] = float(metric_value)
+        history = {}
+        self.last_work = None
+        if len(X_train) > 0:
+            epochs, sample_size = self.plan_local_work(len(X_train), self.round_time_budget)
+            full_split = not seen_sources and sample_size == len(X_train)
+            if sample_size < len(X_train):
+                keep = np.random.default_rng().choice(len(X_train), sample_size, replace=False)
+                X_train = [X_train[i] for i in keep]
+                y_train = [y_train[i] for i in keep]
+            
+            # Train a copy of the model, warm-starting from the current
+            # (global) weights, while inference keeps using the published one
+            model = self._clone_model()
+            start_time = time.time()
+            with CLIENT_STAGE_SECONDS.time(stage='fit'):
+                history = self._fit(model, X_train, y_train, epochs, full_split)
+            elapsed = time.time() - start_time
+            self.publish_model(model)
+            self._trained_sources = sources
+            
+            # Record the work actually done and update the throughput estimate
+            history_dict = getattr(history, 'history', history)
+            epochs_done = history_dict.get('epochs', [None])[-1] or len(history_dict.get('loss', [])) or 1
+            self.last_work = {
+                'num_examples': len(X_train),
+                'epochs': int(epochs_done),
+                'seconds': elapsed
+            }
+            measured = len(X_train) * epochs_done / max(elapsed, 1e-6)
+            self.throughput = measured if self.throughput is None else 0.7 * self.throughput + 0.3 * measured
+        else:
+            print(f"Client {self.client_id} has no new data to train on")
+        
+        # Evaluate model on local validation data
+        model = self.local_model
+        with CLIENT_STAGE_SECONDS.time(stage='evaluate'):
+            eval_results = self._evaluate(model)
+        if eval_results is not None:
+            # Validation metrics by name; Keras 3 groups the compiled metrics
+            # under 'compile_metrics' in metrics_names, so go by the dict
+            for metric_name, metric_value in eval_results.items():
+                metrics[metric_name] = float(metric_value)
         
-        for key, value in history.history.items():
-            if key not in metrics:
+        # Keras returns a History object, SimpleTextClassifier a plain dict
+        history = getattr(history, 'history', history)
+        for key, value in history.items():
+            if key not in metrics and key != 'epochs':
                 metrics[key] = float(value[-1])
                 
         return metrics
     
+    def _post_update(self, weights, metrics, work):
+        """Send an update to the server, returning its response or None"""
+        try:
+            return self.transport.submit_update(self.client_id, weights, metrics, work)
+        except Exception as e:
+            print(f"Error submitting update: {e}")
+            return None
+    
+    def _spool_update(self, weights, metrics):
+        """Spool an update as its delta from the global model it was trained from
+        
+        Falls back to the absolute weights if there is no global model to
+        compare with or the local model no longer has its layout.
+        """
+        if self.global_weights is not None:
+            try:
+                delta = weights_delta(weights, self.global_weights)
+            except ValueError:
+                pass
+            else:
+                return self.spool.put(delta, metrics, self.last_work, self.global_round, delta=True)
+        return self.spool.put(weights, metrics, self.last_work, self.global_round)
+    
     def submit_model_update(self):
-        """Send local model updates to the server"""
-        weights = self.local_model.get_weights()
-        weights_as_lists = [w.tolist() for w in weights]
+        """Send local model updates to the server
         
+        If no local training happened (no data, or no new data when training
+        incrementally) the weights are just the global model's, which is not
+        an update: only a heartbeat is sent, which keeps an earlier update
+        from this round standing.
+        """
         metrics = self.train_local_model()
+        if self.last_work is None:
+            print(f"Client {self.client_id}: no local training, not submitting an update")
+            if self.global_round is None:
+                return None
+            response = self.send_heartbeat(self.global_round)
+            return response if response and response.get('status') == 'success' else None
+        weights = self.local_model.get_weights()
         
-        payload = {
-            'client_id': self.client_id,
-            'weights': weights_as_lists,
-            'metrics': metrics
-        }
+        # While earlier updates are still waiting, merge this one into the spool
+        if len(self.spool) > 0:
+            self._spool_update(weights, metrics)
+            return self.flush_spool()
+        
+        response = self._post_update(weights, metrics, self.last_work)
+        if response is None:
+            merged_rounds = self._spool_update(weights, metrics)
+            print(f"Spooled update to disk ({merged_rounds} local round(s) pending)")
+        return response
+    
+    def flush_spool(self):
+        """Upload the newest spooled update
         
+        The server keeps one update per client and round, so older entries
+        are superseded by the newest one and dropped once it is accepted.
+        Entries past the spool's max_age, and entries the server rejects
+        (e.g. a delta from before a change of the model's vocabulary), are
+        dropped instead of being retried on every cycle.
+        """
+        expired = self.spool.expire()
+        if expired:
+            print(f"Dropped {expired} expired spooled update(s)")
+        entry = self.spool.newest()
+        if entry is None:
+            return None
+        
+        # Upload the spooled bytes as they are, so an interrupted upload of
+        # this entry can resume
+        _, blob = entry
         try:
-            response = requests.post(
-                f"{self.server_url}/submit_update",
-                json=payload
-            )
-            return response.json()
+            response = self.transport.submit_encoded(self.client_id, blob)
+        except requests.RequestException as e:
+            if e.response is not None and e.response.status_code == 422:
+                print(f"Server rejected spooled update, dropping it: {e}")
+                self.spool.clear()
+            else:
+                print(f"Error submitting update: {e}")
+            return None
+        except ValueError as e:
+            # Rejected by a server in this process
+            print(f"Server rejected spooled update, dropping it: {e}")
+            self.spool.clear()
+            return None
         except Exception as e:
             print(f"Error submitting update: {e}")
             return None
+        print("Submitted spooled update")
+        self.spool.clear()
+        return response
     
     def run_training_cycle(self):
         """Run a complete federated training cycle"""
+        # Resubmit offline work first; fetching the global model would
+        # otherwise overwrite the local progress the spooled update is based on
+        if len(self.spool) > 0:
+            if self.flush_spool():
+                return
+        
+        corpus_fingerprint = self.data_processor.corpus_fingerprint()
+        
+        # Skip training when neither the global model nor our data changed
+        if self._last_fingerprint is not None:
+            status = self.get_server_status()
+            if status and self._last_fingerprint == (
+                status.get('round'), status.get('model_hash'), corpus_fingerprint
+            ):
+                response = self.send_heartbeat(status['round'])
+                if response and response.get('status') == 'success':
+                    print(f"Client {self.client_id}: nothing changed, sent heartbeat for round {status['round']}")
+                    return
+                print("Server requested a full update")
+        
         # Get the latest global model
         round_num = self.get_global_model()
         if round_num is None:
@@ -114,6 +434,8 @@ class FederatedClient:
         response = self.submit_model_update()
         if response:
             print(f"Update submitted successfully for round {response.get('round')}")
+            if round_num is not None:
+                self._last_fingerprint = (round_num, self.global_model_hash, corpus_fingerprint)
         else:
             print("Failed to submit update")
     
@@ -131,23 +453,91 @@ class FederatedClient:
                 print(f"Error in training cycle: {e}")
                 time.sleep(10)  # Wait a bit and try again
     
-    def classify_text(self, text):
-        """Use the current model to classify text"""
-        processed_text = self.data_processor.preprocess_text(text)
-        prediction = self.local_model.predict(processed_text)[0]
-        predicted_class = np.argmax(prediction)
+    def _engine(self, snapshot):
+        """Engine that serves predictions for snapshot
+        
+        The configured engine, or the model's own backend when the engine
+        needs a compiled copy the snapshot does not have.
+        """
+        if self.inference_engine in ('numpy', 'tflite') and snapshot.compiled is None:
+            return self.model_backend
+        return self.inference_engine
+    
+    def _predict(self, snapshot, processed_texts, engine):
+        """Class probabilities for preprocessed texts with the given engine (see _engine)"""
+        model_inputs = self._model_inputs(snapshot.model, processed_texts)
+        if engine in ('numpy', 'tflite'):
+            return snapshot.compiled.predict(model_inputs)
+        if uses_token_sequences(snapshot.model):
+            return snapshot.model.predict(model_inputs, verbose=0)
+        return snapshot.model.predict(model_inputs)
+    
+    def classify_batch(self, texts):
+        """Classify a batch of texts with the current model
+        
+        Cleaning, vectorization and prediction each run once for the whole
+        batch; texts found in the prediction cache for the current model
+        version and inference engine are not predicted again (engines give
+        slightly different probabilities, e.g. the quantized TFLite export).
+        Returns (class_ids, probabilities) as NumPy arrays of shape (n,) and
+        (n, num_classes).
+        """
+        num_classes = len(self.data_processor.get_class_names())
+        if len(texts) == 0:
+            return np.zeros(0, dtype=int), np.zeros((0, num_classes))
+        
+        # Work on one snapshot throughout, even if a swap happens meanwhile
+        snapshot = self._snapshot
+        engine = self._engine(snapshot)
+        cache_version = (snapshot.version, engine)
+        processed_texts = self.data_processor.clean_texts(texts)
+        keys = [PredictionCache.key(text) for text in processed_texts]
+        
+        probabilities = np.zeros((len(texts), num_classes))
+        missing = []
+        for i, key in enumerate(keys):
+            cached = self.prediction_cache.get(key, cache_version)
+            if cached is None:
+                missing.append(i)
+            else:
+                probabilities[i] = cached
         
+        if missing:
+            with CLIENT_STAGE_SECONDS.time(stage='classify'):
+                predicted = np.asarray(self._predict(snapshot, [processed_texts[i] for i in missing], engine))
+            probabilities[missing] = predicted
+            for i, prediction in zip(missing, predicted):
+                self.prediction_cache.put(keys[i], cache_version, prediction)
+        CLASSIFIED_TEXTS.inc(len(texts))
+        
+        return probabilities.argmax(axis=1), probabilities
+    
+    def _format_prediction(self, class_id, prediction):
+        """Build the per-text result dict returned by classify_text"""
         class_names = self.data_processor.get_class_names()
+        predicted_class = int(class_id)
         confidence = float(prediction[predicted_class])
         
         return {
             'class_name': class_names[predicted_class],
-            'class_id': int(predicted_class),
+            'class_id': predicted_class,
             'confidence': confidence,
             'probabilities': {
                 class_names[i]: float(p) for i, p in enumerate(prediction)
             }
         }
+    
+    def classify_texts(self, texts):
+        """Classify a batch of texts, returning one classify_text result per text"""
+        class_ids, probabilities = self.classify_batch(texts)
+        return [
+            self._format_prediction(class_id, prediction)
+            for class_id, prediction in zip(class_ids, probabilities)
+        ]
+    
+    def classify_text(self, text):
+        """Use the current model to classify text"""
+        return self.classify_texts([text])[0]
 
 if __name__ == '__main__':
     # Example usage
@@ -2,44 +2,127 @@
 import os
 import json
 import re
+import hashlib
 import numpy as np
-import tensorflow as tf
-from tensorflow.keras.preprocessing.text import Tokenizer
-from tensorflow.keras.preprocessing.sequence import pad_sequences
 import random
 
+# Characters stripped from text before tokenization
+PUNCTUATION_RE = re.compile(r'[^\w\s]')
+
+# Version of the persisted tokenizer and token caches; bumped when the
+# text they were built from changes (2: cleaned with clean_texts)
+TOKENIZER_STATE_VERSION = 2
+
+# Labeled data files are named class_id_*.txt
+LABELED_FILE_RE = re.compile(r'(\d+)')
+
+
+def label_from_filename(filename):
+    """Class id of a labeled data file (e.g. 12 for 12_reviews.txt), or None"""
+    if not filename.endswith('.txt'):
+        return None
+    match = LABELED_FILE_RE.match(filename)
+    return int(match.group(1)) if match else None
+
+
 class TextDataProcessor:
     def __init__(self, data_dir, max_vocab_size=10000, max_sequence_length=250):
         self.data_dir = data_dir
         self.max_vocab_size = max_vocab_size
         self.max_sequence_length = max_sequence_length
-        self.tokenizer = None
+        self._tokenizer = None
+        self._tokenizer_sources = set()
         self.class_names = []
         
         # Create data directory if it doesn't exist
         os.makedirs(data_dir, exist_ok=True)
         
-        # Initialize tokenizer
-        self._initialize_tokenizer()
+        self._load_class_names()
+    
+    @property
+    def tokenizer(self):
+        """Keras tokenizer, built on first use
+        
+        Only the Keras backends consume token sequences, so with the sklearn
+        backend it is never built and TensorFlow is never imported.
+        """
+        if self._tokenizer is None:
+            self._initialize_tokenizer()
+        return self._tokenizer
+    
+    @property
+    def tokenizer_path(self):
+        """File the fitted tokenizer is persisted to between restarts"""
+        return os.path.join(self.data_dir, '.cache', 'tokenizer.json')
+    
+    def _text_files(self):
+        """Names of all text files in the data directory, in a stable order"""
+        return sorted(filename for filename in os.listdir(self.data_dir) if filename.endswith('.txt'))
     
     def _initialize_tokenizer(self):
-        """Initialize and fit the tokenizer on available data"""
-        all_texts = []
+        """Load the persisted tokenizer and fit it on files it has not seen
         
-        # Load all available text data
-        for filename in os.listdir(self.data_dir):
-            if filename.endswith('.txt'):
+        After the first start only text files added since the tokenizer was
+        saved are read, instead of the whole corpus.
+        """
+        from tensorflow.keras.preprocessing.text import Tokenizer
+        
+        self._tokenizer = self._load_tokenizer()
+        if self._tokenizer is None:
+            self._tokenizer = Tokenizer(num_words=self.max_vocab_size, oov_token='<OOV>')
+            self._tokenizer_sources = set()
+        
+        new_files = [filename for filename in self._text_files() if filename not in self._tokenizer_sources]
+        if new_files:
+            texts = []
+            for filename in new_files:
                 with open(os.path.join(self.data_dir, filename), 'r', encoding='utf-8') as file:
-                    all_texts.append(file.read())
+                    texts.append(file.read())
+            self._tokenizer.fit_on_texts(self.clean_texts(texts))
+            self._tokenizer_sources.update(new_files)
+            self._save_tokenizer()
+    
+    def _load_tokenizer(self):
+        """Tokenizer saved by _save_tokenizer, or None if missing or stale"""
+        from collections import OrderedDict, defaultdict
+        from tensorflow.keras.preprocessing.text import tokenizer_from_json
         
-        # Initialize from existing data or create empty tokenizer
-        if all_texts:
-            self.tokenizer = Tokenizer(num_words=self.max_vocab_size, oov_token='<OOV>')
-            self.tokenizer.fit_on_texts(all_texts)
-        else:
-            self.tokenizer = Tokenizer(num_words=self.max_vocab_size, oov_token='<OOV>')
+        if not os.path.exists(self.tokenizer_path):
+            return None
+        try:
+            with open(self.tokenizer_path, 'r', encoding='utf-8') as file:
+                state = json.load(file)
+            tokenizer = tokenizer_from_json(state['tokenizer'])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable tokenizer state: {e}")
+            return None
+        
+        if tokenizer.num_words != self.max_vocab_size or state.get('version') != TOKENIZER_STATE_VERSION:
+            return None
         
-        # Load class names if available
+        # tokenizer_from_json restores plain dicts; fit_on_texts needs the
+        # original counter types to keep fitting
+        tokenizer.word_counts = OrderedDict(tokenizer.word_counts)
+        tokenizer.word_docs = defaultdict(int, tokenizer.word_docs)
+        tokenizer.index_docs = defaultdict(int, tokenizer.index_docs)
+        self._tokenizer_sources = set(state.get('sources', []))
+        return tokenizer
+    
+    def _save_tokenizer(self):
+        """Atomically persist the tokenizer and the files it was fitted on"""
+        os.makedirs(os.path.dirname(self.tokenizer_path), exist_ok=True)
+        state = {
+            'version': TOKENIZER_STATE_VERSION,
+            'sources': sorted(self._tokenizer_sources),
+            'tokenizer': self._tokenizer.to_json()
+        }
+        tmp_path = self.tokenizer_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(state, file)
+        os.replace(tmp_path, self.tokenizer_path)
+    
+    def _load_class_names(self):
+        """Load class names if available, otherwise write the defaults"""
         class_names_path = os.path.join(self.data_dir, 'class_names.json')
         if os.path.exists(class_names_path):
             with open(class_names_path, 'r') as file:
@@ -53,26 +136,36 @@ class TextDataProcessor:
     def preprocess_text(self, text):
         """Preprocess a single text input"""
         # Basic cleaning
-        text = text.lower()
-        text = re.sub(r'[^\w\s]', '', text)
+        text = self.clean_texts([text])[0]
         
         # Tokenize and pad
-        sequence = self.tokenizer.texts_to_sequences([text])
-        padded = pad_sequences(sequence, maxlen=self.max_sequence_length)
+        padded = self.texts_to_sequences([text])
         
         # Return with the proper shape (batch_size, sequence_length)
         return padded  # Now returns array with shape (1, max_sequence_length)
+    
+    def texts_to_sequences(self, texts):
+        """Tokenize and pad a batch of texts for the Keras backends"""
+        from tensorflow.keras.preprocessing.sequence import pad_sequences
         
+        sequences = self.tokenizer.texts_to_sequences(texts)
+        return pad_sequences(sequences, maxlen=self.max_sequence_length)
+        
+    def clean_texts(self, texts):
+        """Apply the basic cleaning (lowercase, no punctuation) to a batch of texts"""
+        return [PUNCTUATION_RE.sub('', text.lower()) for text in texts]
+    
     def load_data(self):
         """Load all available data"""
+        from tensorflow.keras.preprocessing.sequence import pad_sequences
+        
         texts = []
         labels = []
         
         # Look for labeled data files (format: class_id_*.txt)
         for filename in os.listdir(self.data_dir):
-            if filename.endswith('.txt') and filename[0].isdigit():
-                class_id = int(filename[0])
-                
+            class_id = label_from_filename(filename)
+            if class_id is not None:
                 with open(os.path.join(self.data_dir, filename), 'r', encoding='utf-8') as file:
                     content = file.read()
                     
@@ -87,26 +180,28 @@ class TextDataProcessor:
         if not texts:
             return np.array([]), np.array([])
         
-        # Tokenize all texts
-        sequences = self.tokenizer.texts_to_sequences(texts)
+        # Tokenize all texts, cleaned as at inference
+        sequences = self.tokenizer.texts_to_sequences(self.clean_texts(texts))
         # Pad sequences
         padded_sequences = pad_sequences(sequences, maxlen=self.max_sequence_length)
         
         return padded_sequences, np.array(labels)
         
-    # client/data_processor.py
-# Update the get_training_data and get_validation_data methods
-
-    def get_training_data(self, validation_split=0.2):
-        """Get training data with validation split"""
+    def _read_labeled_examples(self):
+        """Read all labeled examples along with the file each came from
+        
+        Texts are cleaned with clean_texts, exactly as texts are before
+        inference, so training and inference see the same tokens (e.g. "dont"
+        for "don't", not "don").
+        """
         texts = []
         labels = []
+        sources = []
         
         # Look for labeled data files (format: class_id_*.txt)
-        for filename in os.listdir(self.data_dir):
-            if filename.endswith('.txt') and filename[0].isdigit():
-                class_id = int(filename[0])
-                
+        for filename in sorted(os.listdir(self.data_dir)):
+            class_id = label_from_filename(filename)
+            if class_id is not None:
                 with open(os.path.join(self.data_dir, filename), 'r', encoding='utf-8') as file:
                     content = file.read()
                     
@@ -116,59 +211,170 @@ class TextDataProcessor:
                         if example.strip():
                             texts.append(example.strip())
                             labels.append(class_id)
+                            sources.append(filename)
+        
+        return self.clean_texts(texts), labels, sources
+    
+    def _split_indices(self, num_examples, validation_split):
+        """Deterministic train/validation split of example indices"""
+        np.random.seed(42)
+        indices = np.random.permutation(num_examples)
+        split_idx = int(num_examples * (1 - validation_split))
+        return indices[:split_idx], indices[split_idx:]
+
+    def get_training_data(self, validation_split=0.2):
+        """Get training data with validation split"""
+        texts, labels, _ = self._read_labeled_examples()
         
         # If we have no data, return empty arrays
         if len(texts) == 0:
             return [], []
         
         # Split data
-        np.random.seed(42)
-        indices = np.random.permutation(len(texts))
-        split_idx = int(len(texts) * (1 - validation_split))
-        
-        train_indices = indices[:split_idx]
+        train_indices, _ = self._split_indices(len(texts), validation_split)
         
         train_texts = [texts[i] for i in train_indices]
         train_labels = [labels[i] for i in train_indices]
         
         return train_texts, train_labels
 
+    def get_incremental_training_data(self, seen_sources, replay_size=200, validation_split=0.2):
+        """Get training data from files not in seen_sources plus a replay sample
+        
+        Returns the texts, the labels and the set of all sources in the
+        training split, so the caller can record what has been trained on.
+        """
+        texts, labels, sources = self._read_labeled_examples()
+        if len(texts) == 0:
+            return [], [], set()
+        
+        train_indices, _ = self._split_indices(len(texts), validation_split)
+        new_indices = [i for i in train_indices if sources[i] not in seen_sources]
+        old_indices = [i for i in train_indices if sources[i] in seen_sources]
+        
+        # Replay a random sample of already-seen examples so the model does
+        # not drift towards the newest data only
+        if new_indices and old_indices and replay_size > 0:
+            replay = np.random.default_rng().choice(old_indices, min(replay_size, len(old_indices)), replace=False)
+            new_indices.extend(int(i) for i in replay)
+        
+        train_texts = [texts[i] for i in new_indices]
+        train_labels = [labels[i] for i in new_indices]
+        
+        return train_texts, train_labels, {sources[i] for i in train_indices}
+
     def get_validation_data(self, validation_split=0.2):
         """Get validation data"""
-        texts = []
-        labels = []
-        
-        # Look for labeled data files
-        for filename in os.listdir(self.data_dir):
-            if filename.endswith('.txt') and filename[0].isdigit():
-                class_id = int(filename[0])
-                
-                with open(os.path.join(self.data_dir, filename), 'r', encoding='utf-8') as file:
-                    content = file.read()
-                    
-                    # Split into separate examples
-                    examples = content.split('\n\n')
-                    for example in examples:
-                        if example.strip():
-                            texts.append(example.strip())
-                            labels.append(class_id)
+        texts, labels, _ = self._read_labeled_examples()
         
         # If we have no data, return empty arrays
         if len(texts) == 0:
             return [], []
         
         # Split data
-        np.random.seed(42)
-        indices = np.random.permutation(len(texts))
-        split_idx = int(len(texts) * (1 - validation_split))
-        
-        val_indices = indices[split_idx:]
+        _, val_indices = self._split_indices(len(texts), validation_split)
         
         val_texts = [texts[i] for i in val_indices]
         val_labels = [labels[i] for i in val_indices]
         
         return val_texts, val_labels
     
+    def corpus_fingerprint(self):
+        """Cheap fingerprint of the labeled corpus
+        
+        Based on file names, sizes and modification times, so it changes
+        whenever data is added or edited without reading any file contents.
+        """
+        digest = hashlib.sha1()
+        for filename in sorted(os.listdir(self.data_dir)):
+            if label_from_filename(filename) is not None:
+                stat = os.stat(os.path.join(self.data_dir, filename))
+                digest.update(f"{filename}:{stat.st_size}:{stat.st_mtime_ns};".encode('utf-8'))
+        return digest.hexdigest()[:16]
+    
+    def tokenize_ragged(self, texts):
+        """Tokenize texts once into a flat int32 token array plus row lengths
+        
+        Rows are truncated to the last max_sequence_length tokens, like
+        pad_sequences, but not padded, which keeps the arrays compact.
+        """
+        sequences = [sequence[-self.max_sequence_length:] for sequence in self.tokenizer.texts_to_sequences(texts)]
+        lengths = np.array([len(sequence) for sequence in sequences], dtype=np.int32)
+        flat = np.fromiter(
+            (token for sequence in sequences for token in sequence),
+            dtype=np.int32, count=int(lengths.sum())
+        )
+        return flat, lengths
+    
+    def get_tokenized_split(self, split='train', validation_split=0.2):
+        """Tokenized (flat, lengths, labels) of a data split, cached on disk
+        
+        The cache file is keyed by the corpus fingerprint and the tokenizer
+        vocabulary size, so it is rebuilt only when the data or tokenizer
+        changes.
+        """
+        cache_key = hashlib.sha1(
+            f"{self.corpus_fingerprint()}:{len(self.tokenizer.word_index)}:"
+            f"{self.max_sequence_length}:{validation_split}:{TOKENIZER_STATE_VERSION}".encode('utf-8')
+        ).hexdigest()[:16]
+        cache_dir = os.path.join(self.data_dir, '.cache')
+        cache_path = os.path.join(cache_dir, f"tokens_{split}_{cache_key}.npz")
+        
+        if os.path.exists(cache_path):
+            with np.load(cache_path) as cached:
+                return cached['flat'], cached['lengths'], cached['labels']
+        
+        if split == 'train':
+            texts, labels = self.get_training_data(validation_split)
+        else:
+            texts, labels = self.get_validation_data(validation_split)
+        flat, lengths = self.tokenize_ragged(texts)
+        labels = np.asarray(labels, dtype=np.int32)
+        
+        # Replace older cache files of this split
+        os.makedirs(cache_dir, exist_ok=True)
+        for filename in os.listdir(cache_dir):
+            if filename.startswith(f"tokens_{split}_"):
+                os.remove(os.path.join(cache_dir, filename))
+        np.savez(cache_path, flat=flat, lengths=lengths, labels=labels)
+        
+        return flat, lengths, labels
+    
+    def build_token_dataset(self, flat, lengths, labels, batch_size=32, shuffle=True):
+        """tf.data pipeline over pre-tokenized rows
+        
+        Rows are shuffled, padded to max_sequence_length in a parallel map,
+        batched and prefetched, so no tokenization happens per epoch.
+        """
+        import tensorflow as tf
+        
+        max_length = self.max_sequence_length
+        rows = tf.RaggedTensor.from_row_lengths(flat, lengths)
+        dataset = tf.data.Dataset.from_tensor_slices((rows, labels))
+        
+        if shuffle:
+            dataset = dataset.shuffle(max(1, min(len(labels), 10000)), reshuffle_each_iteration=True)
+        
+        def pad(tokens, label):
+            # Pre-padding, as pad_sequences does
+            tokens = tokens[-max_length:]
+            tokens = tf.pad(tokens, [[max_length - tf.shape(tokens)[0], 0]])
+            return tf.ensure_shape(tokens, [max_length]), label
+        
+        return (
+            dataset
+            .map(pad, num_parallel_calls=tf.data.AUTOTUNE)
+            .batch(batch_size)
+            .prefetch(tf.data.AUTOTUNE)
+        )
+    
+    def get_token_dataset(self, split='train', batch_size=32, shuffle=None, validation_split=0.2):
+        """tf.data dataset of a split for fitting or evaluating a Keras model"""
+        if shuffle is None:
+            shuffle = split == 'train'
+        flat, lengths, labels = self.get_tokenized_split(split, validation_split)
+        return self.build_token_dataset(flat, lengths, labels, batch_size=batch_size, shuffle=shuffle)
+    
     def get_class_names(self):
         """Return list of class names"""
         return self.class_names
@@ -180,8 +386,12 @@ class TextDataProcessor:
         with open(os.path.join(self.data_dir, filename), 'w', encoding='utf-8') as file:
             file.write(text)
         
-        # Update tokenizer
-        self.tokenizer.fit_on_texts([text])
+        # Update a built tokenizer with just this text; an unbuilt one picks
+        # the file up when it is next built
+        if self._tokenizer is not None:
+            self._tokenizer.fit_on_texts(self.clean_texts([text]))
+            self._tokenizer_sources.add(filename)
+            self._save_tokenizer()
     
     def add_data_from_web(self, source_url, class_id=None):
         """Add data from web source (simplified)"""
@@ -0,0 +1,79 @@
+# client/prediction_cache.py
+import hashlib
+import threading
+from collections import OrderedDict
+
+class PredictionCache:
+    """Bounded LRU cache of predictions keyed by preprocessed text
+
+    Keys are hashes of the cleaned text, so texts that only differ in case
+    or punctuation share an entry. Every entry is tagged with the model
+    version it was computed with (any comparable value, e.g. a tuple of the
+    version and the inference engine); a lookup under a different version
+    is a miss and drops the stale entry.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(processed_text):
+        """Cache key for an already preprocessed text"""
+        return hashlib.sha1(processed_text.encode('utf-8')).digest()
+
+    def get(self, key, model_version):
+        """Return the cached prediction for key, or None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            version, prediction = entry
+            if version != model_version:
+                del self.entries[key]
+                self.invalidations += 1
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return prediction
+
+    def put(self, key, model_version, prediction):
+        """Store a prediction, evicting the least recently used entries"""
+        if self.max_entries <= 0:
+            return
+
+        with self.lock:
+            self.entries[key] = (model_version, prediction)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all entries"""
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """Hit/miss/eviction counters"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self.entries),
+                'max_entries': self.max_entries
+            }
@@ -0,0 +1,226 @@
+# client/transport.py
+import zlib
+import hashlib
+import numpy as np
+import requests
+from utils.communication import (
+    encode_update, decode_update, to_param_dtype, get_transport, retry_with_backoff, CircuitOpenError
+)
+from utils.instrumentation import CLIENT_STAGE_SECONDS, CLIENT_UPLOADED_BYTES
+
+
+class UploadRejectedError(requests.HTTPError):
+    """A 4xx answer to an upload request that the same request would get again
+
+    Not retried, unlike connection errors, 5xx answers and 404 for an
+    expired upload session.
+    """
+
+
+def raise_for_upload_status(response):
+    """raise_for_status, raising UploadRejectedError for final 4xx answers"""
+    try:
+        response.raise_for_status()
+    except requests.HTTPError as e:
+        if 400 <= response.status_code < 500 and response.status_code != 404:
+            raise UploadRejectedError(str(e), response=response) from e
+        raise
+
+
+def read_only(weights):
+    """Read-only views of weight arrays, so neither side can modify the other's copy"""
+    views = []
+    for w in weights:
+        view = np.asarray(w).view()
+        view.flags.writeable = False
+        views.append(view)
+    return views
+
+
+class HttpServerTransport:
+    """Talks to a remote FederatedServer over its HTTP API
+
+    The global model is fetched as JSON; updates are encoded in the compact
+    binary format and sent with the resumable chunked upload protocol.
+    """
+
+    def __init__(self, server_url, wire_dtype='float32', upload_attempts=3):
+        self.server_url = server_url
+        # Pooled connections, timeouts, retries and circuit breaker for the server
+        self.http = get_transport(server_url)
+        # Precision of weights in uploaded updates (a WIRE_DTYPES key)
+        self.wire_dtype = wire_dtype
+        self.upload_attempts = upload_attempts
+        self._pending_upload = None
+
+    def fetch_model(self):
+        """Global model as a dict with round, model_hash, time_budget and
+        weights (float32 arrays), or None on an error response"""
+        with CLIENT_STAGE_SECONDS.time(stage='fetch'):
+            response = self.http.get('/get_model')
+        if response.status_code != 200:
+            print(f"Error fetching model: {response.text}")
+            return None
+
+        with CLIENT_STAGE_SECONDS.time(stage='decode'):
+            data = response.json()
+            # Convert lists back to float32 numpy arrays
+            data['weights'] = to_param_dtype(np.array(w) for w in data['weights'])
+        return data
+
+    def fetch_tflite(self):
+        """int8 TFLite flatbuffer of the global model, or None"""
+        response = self.http.get('/get_model_tflite')
+        if response.status_code != 200:
+            print(f"Error fetching TFLite model: {response.text}")
+            return None
+        return response.content
+
+    def get_status(self):
+        response = self.http.get('/get_status')
+        if response.status_code != 200:
+            print(f"Error fetching server status: {response.text}")
+            return None
+        return response.json()
+
+    def heartbeat(self, client_id, round_num):
+        response = self.http.post('/heartbeat', json={'client_id': client_id, 'round': round_num})
+        return response.json()
+
+    def submit_update(self, client_id, weights, metrics, work):
+        """Encode an update and upload it to the server"""
+        with CLIENT_STAGE_SECONDS.time(stage='encode'):
+            blob = encode_update(weights, {'metrics': metrics, 'work': work}, wire_dtype=self.wire_dtype)
+        return self.submit_encoded(client_id, blob)
+
+    def submit_encoded(self, client_id, blob):
+        """Upload an encoded update with the server's resumable chunked protocol
+
+        An interrupted upload of the same body (also from an earlier cycle)
+        resumes from the byte offset the server has received.
+        """
+        sha256 = hashlib.sha256(blob).hexdigest()
+        if self._pending_upload and self._pending_upload['sha256'] != sha256:
+            self._pending_upload = None
+        view = memoryview(blob)
+
+        def upload():
+            session = self._pending_upload
+            if session is None:
+                response = self.http.post(
+                    '/upload/initiate',
+                    json={'client_id': client_id, 'total_size': len(blob), 'sha256': sha256}
+                )
+                raise_for_upload_status(response)
+                session = self._pending_upload = dict(response.json(), sha256=sha256)
+            else:
+                response = self.http.get(f"/upload/{session['upload_id']}")
+                if response.status_code == 404:
+                    # Session expired on the server, start over next attempt
+                    self._pending_upload = None
+                raise_for_upload_status(response)
+                session.update(response.json())
+
+            upload_path = f"/upload/{session['upload_id']}"
+            offset = session['offset']
+            while offset < len(blob):
+                chunk = view[offset:offset + session['chunk_size']]
+                response = self.http.put(
+                    upload_path,
+                    params={'offset': offset},
+                    data=bytes(chunk),
+                    headers={
+                        'Content-Type': 'application/octet-stream',
+                        'X-Chunk-CRC32': format(zlib.crc32(chunk), '08x')
+                    }
+                )
+                if response.status_code == 409:
+                    # Out of sync with the server, continue from its offset
+                    offset = response.json()['offset']
+                    continue
+                raise_for_upload_status(response)
+                offset = session['offset'] = response.json()['offset']
+
+            response = self.http.post(f"{upload_path}/commit")
+            if response.status_code in (404, 422):
+                self._pending_upload = None
+            raise_for_upload_status(response)
+            self._pending_upload = None
+            return response.json()
+
+        # No point retrying while the server's circuit is open, or a request
+        # the server has refused (e.g. a rejected update or a body too large)
+        with CLIENT_STAGE_SECONDS.time(stage='upload'):
+            result = retry_with_backoff(
+                upload, max_attempts=self.upload_attempts, no_retry=(CircuitOpenError, UploadRejectedError)
+            )
+        CLIENT_UPLOADED_BYTES.inc(len(blob))
+        return result
+
+    def stats(self):
+        return self.http.stats()
+
+
+class InProcessTransport:
+    """Talks to a FederatedServer running in the same process
+
+    Weights are handed over as read-only views of the NumPy arrays, without
+    serialization or copies, straight to the server's receive_update. Used
+    when the server and clients run together (main.py --mode all) and for
+    simulations.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.models_fetched = 0
+        self.updates_submitted = 0
+
+    def fetch_model(self):
+        self.models_fetched += 1
+        server = self.server
+        with CLIENT_STAGE_SECONDS.time(stage='fetch'):
+            weights = read_only(server.global_model.get_weights())
+        return {
+            'round': server.round_number,
+            'model_hash': server.model_hash,
+            'time_budget': server.round_time_budget,
+            'backend': server.model_backend,
+            'weights': weights
+        }
+
+    def fetch_tflite(self):
+        export = self.server.get_tflite_model()
+        if export is None:
+            return None
+        with open(export[1], 'rb') as file:
+            return file.read()
+
+    def get_status(self):
+        return self.server.status()
+
+    def heartbeat(self, client_id, round_num):
+        if not self.server.accept_heartbeat(client_id):
+            return {'status': 'update_required', 'round': self.server.round_number}
+        return {'status': 'success', 'round': self.server.round_number}
+
+    def submit_update(self, client_id, weights, metrics, work):
+        self.updates_submitted += 1
+        with CLIENT_STAGE_SECONDS.time(stage='upload'):
+            self.server.receive_update(client_id, read_only(weights), metrics, work)
+        return {'status': 'success', 'round': self.server.round_number}
+
+    def submit_encoded(self, client_id, blob):
+        """Hand over an update that was spooled in the binary format"""
+        weights, metadata = decode_update(blob)
+        self.updates_submitted += 1
+        with CLIENT_STAGE_SECONDS.time(stage='upload'):
+            self.server.receive_update(client_id, weights, metadata.get('metrics', {}), metadata.get('work'),
+                                       delta=metadata.get('delta', False))
+        return {'status': 'success', 'round': self.server.round_number}
+
+    def stats(self):
+        return {
+            'in_process': True,
+            'models_fetched': self.models_fetched,
+            'updates_submitted': self.updates_submitted
+        }
@@ -0,0 +1,107 @@
+# client/update_spool.py
+import os
+import time
+from utils.communication import encode_update, decode_update
+
+class UpdateSpool:
+    """Bounded on-disk queue of model updates that could not be submitted
+
+    Each entry is one file in the compact binary update format, normally
+    holding the delta of the local weights from the global model of
+    base_round (see weights_delta), so the server can apply the local
+    progress to whatever its global model is by the time the entry arrives.
+    Updates trained from the same global round are merged into a single
+    entry: local training continues from the local model while offline, so
+    the newest delta already contains every earlier local round and is kept
+    as the cumulative update, with the work of all merged rounds added up.
+    Entries older than max_age seconds are dropped by expire().
+    """
+
+    def __init__(self, spool_dir, max_entries=5, wire_dtype='float32', max_age=3 * 24 * 3600):
+        self.spool_dir = spool_dir
+        self.max_entries = max_entries
+        self.max_age = max_age
+        # Entries are uploaded as they are stored, so they use the wire precision
+        self.wire_dtype = wire_dtype
+        os.makedirs(spool_dir, exist_ok=True)
+
+    def _entry_files(self):
+        """Spooled update files, oldest first"""
+        return sorted(
+            filename for filename in os.listdir(self.spool_dir)
+            if filename.endswith('.update')
+        )
+
+    def __len__(self):
+        return len(self._entry_files())
+
+    def put(self, weights, metrics, work, base_round, delta=False):
+        """Spool an update, merging it into the newest entry if possible
+        
+        delta tells whether weights are relative to the global model of
+        base_round rather than absolute.
+        """
+        entries = self._entry_files()
+        merged_rounds = 1
+
+        if entries:
+            _, newest = self.load(entries[-1])
+            if newest.get('base_round') == base_round and newest.get('delta', False) == delta:
+                previous_work = newest.get('work') or {}
+                if work:
+                    work = dict(work)
+                    work['num_examples'] = max(work.get('num_examples', 0), previous_work.get('num_examples', 0))
+                    work['epochs'] = work.get('epochs', 0) + previous_work.get('epochs', 0)
+                    work['seconds'] = work.get('seconds', 0.0) + previous_work.get('seconds', 0.0)
+                else:
+                    work = previous_work
+                merged_rounds += newest.get('merged_rounds', 1)
+                os.remove(os.path.join(self.spool_dir, entries.pop()))
+
+        metadata = {
+            'metrics': metrics,
+            'work': work,
+            'base_round': base_round,
+            'delta': delta,
+            'merged_rounds': merged_rounds,
+            'spooled_at': time.time()
+        }
+        filename = f"{time.time_ns()}.update"
+        tmp_path = os.path.join(self.spool_dir, filename + '.tmp')
+        with open(tmp_path, 'wb') as file:
+            file.write(encode_update(weights, metadata, wire_dtype=self.wire_dtype))
+        os.replace(tmp_path, os.path.join(self.spool_dir, filename))
+
+        # Keep the spool bounded by dropping the oldest entries
+        entries.append(filename)
+        while len(entries) > self.max_entries:
+            os.remove(os.path.join(self.spool_dir, entries.pop(0)))
+
+        return merged_rounds
+
+    def load(self, filename):
+        """Read a spooled entry as (weights, metadata)"""
+        with open(os.path.join(self.spool_dir, filename), 'rb') as file:
+            return decode_update(file.read())
+
+    def newest(self):
+        """Return (filename, encoded update) of the newest entry, or None"""
+        entries = self._entry_files()
+        if not entries:
+            return None
+        with open(os.path.join(self.spool_dir, entries[-1]), 'rb') as file:
+            return entries[-1], file.read()
+
+    def expire(self):
+        """Drop entries spooled more than max_age seconds ago; returns how many"""
+        # Entry names are the time_ns at which they were written
+        cutoff = time.time_ns() - int(self.max_age * 1e9)
+        expired = [filename for filename in self._entry_files() if int(filename.split('.')[0]) < cutoff]
+        for filename in expired:
+            os.remove(os.path.join(self.spool_dir, filename))
+        return len(expired)
+
+    def clear(self):
+        """Remove all spooled entries"""
+        for filename in self._entry_files():
+            os.remove(os.path.join(self.spool_dir, filename))
@@ -2,15 +2,38 @@
 import os
 import json
 import time
-import requests
-from flask import Flask, render_template, request, jsonify
+import queue
+from flask import Flask, Response, render_template, request, jsonify
 import threading
+from dashboard.poller import SnapshotPoller
+from utils.communication import get_transport
 
 dashboard = Flask(__name__)
 
 # Configure the dashboard app
 dashboard.config['SERVER_URL'] = 'http://localhost:5000'
 dashboard.config['CLIENT_URL'] = 'http://localhost:5001'
+# One background poller serves every viewer: seconds between status polls,
+# points per chart series and seconds between SSE keep-alive comments
+dashboard.config['STATUS_INTERVAL'] = 5.0
+dashboard.config['CHART_POINTS'] = 500
+dashboard.config['SSE_KEEPALIVE'] = 15.0
+
+poller = None
+poller_lock = threading.Lock()
+
+def get_poller():
+    """Return the upstream poller, starting it on first use"""
+    global poller
+    if poller is None:
+        with poller_lock:
+            if poller is None:
+                poller = SnapshotPoller(
+                    get_transport(dashboard.config['SERVER_URL']),
+                    status_interval=dashboard.config['STATUS_INTERVAL'],
+                    chart_points=dashboard.config['CHART_POINTS']
+                )
+    return poller
 
 @dashboard.route('/')
 def index():
@@ -19,39 +42,82 @@ def index():
 
 @dashboard.route('/api/server_status')
 def server_status():
-    """Get status from the federated server"""
+    """Get status from the federated server, as last seen by the poller"""
+    status = get_poller().cached('status')
+    if status is not None:
+        return jsonify(status)
+    
     try:
-        response = requests.get(f"{dashboard.config['SERVER_URL']}/get_status")
+        response = get_transport(dashboard.config['SERVER_URL']).get('/get_status')
         return response.json()
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @dashboard.route('/api/metrics')
 def get_metrics():
-    """Get training metrics"""
+    """Get training metrics; since/limit paging and points downsampling are
+    passed through to the server"""
     try:
-        response = requests.get(f"{dashboard.config['SERVER_URL']}/get_metrics")
+        response = get_transport(dashboard.config['SERVER_URL']).get('/get_metrics', params=request.args)
         return response.json()
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@dashboard.route('/api/events')
+def events():
+    """Server-Sent Events stream of status and metrics snapshots
+    
+    A new viewer first receives the cached snapshot, then every change the
+    poller sees. Viewers never cause requests to the federated server.
+    """
+    upstream = get_poller()
+    keepalive = dashboard.config['SSE_KEEPALIVE']
+    
+    def stream():
+        subscriber = upstream.subscribe()
+        try:
+            for event, data in upstream.snapshot():
+                yield f"event: {event}\ndata: {data}\n\n"
+            while True:
+                try:
+                    event, data = subscriber.get(timeout=keepalive)
+                    yield f"event: {event}\ndata: {data}\n\n"
+                except queue.Empty:
+                    # Comment line keeping proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+        finally:
+            upstream.unsubscribe(subscriber)
+    
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @dashboard.route('/api/start_round', methods=['POST'])
 def start_round():
     """Trigger a new training round"""
     try:
-        response = requests.post(f"{dashboard.config['SERVER_URL']}/start_round")
+        response = get_transport(dashboard.config['SERVER_URL']).post('/start_round')
         return response.json()
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@dashboard.route('/api/transport_stats')
+def transport_stats():
+    """Connection reuse and latency of the dashboard's upstream calls"""
+    return jsonify({
+        'server': get_transport(dashboard.config['SERVER_URL']).stats(),
+        'client': get_transport(dashboard.config['CLIENT_URL']).stats()
+    })
+
 @dashboard.route('/api/classify', methods=['POST'])
 def classify_text():
     """Send text to a client for classification"""
     text = request.json.get('text', '')
     
     try:
-        response = requests.post(
-            f"{dashboard.config['CLIENT_URL']}/classify",
+        response = get_transport(dashboard.config['CLIENT_URL']).post(
+            '/classify',
             json={'text': text}
         )
         return response.json()
@@ -258,11 +324,13 @@ def create_templates_directory():
                 });
             }
             
-            // Update status information
-            async function updateStatus() {
+            // Show a status snapshot pushed by the dashboard server
+            function renderStatus(data) {
                 try {
-                    const response = await fetch('/api/server_status');
-                    const data = await response.json();
+                    if (data.error) {
+                        document.getElementById('trainingStatus').textContent = 'Server unreachable';
+                        return;
+                    }
                     
                     document.getElementById('currentRound').textContent = data.round;
                     document.getElementById('trainingStatus').textContent = data.is_training ? 'Training' : 'Idle';
@@ -288,32 +356,28 @@ def create_templates_directory():
                 }
             }
             
-            // Update metrics charts
-            async function updateMetrics() {
-                try {
-                    const response = await fetch('/api/metrics');
-                    const data = await response.json();
-                    
-                    if (data.metrics_history && data.metrics_history.length > 0) {
-                        const rounds = data.metrics_
-                    if (data.metrics_history && data.metrics_history.length > 0) {
-                        const rounds = data.metrics_history.map(m => `Round ${m.round}`);
-                        const accuracies = data.metrics_history.map(m => m.metrics.accuracy || 0);
-                        const losses = data.metrics_history.map(m => m.metrics.loss || 0);
-                        
-                        // Update accuracy chart
-                        accuracyChart.data.labels = rounds;
-                        accuracyChart.data.datasets[0].data = accuracies;
-                        accuracyChart.update();
-                        
-                        // Update loss chart
-                        lossChart.data.labels = rounds;
-                        lossChart.data.datasets[0].data = losses;
-                        lossChart.update();
-                    }
-                } catch (error) {
-                    console.error('Error updating metrics:', error);
+            function setSeries(chart, series) {
+                chart.data.labels = series ? series.rounds.map(r => `Round ${r}`) : [];
+                chart.data.datasets[0].data = series ? series.values : [];
+                chart.update();
+            }
+            
+            // Show the downsampled metric series pushed after each round
+            function renderMetrics(data) {
+                if (!data.series) {
+                    return;
                 }
+                setSeries(accuracyChart, data.series.accuracy);
+                setSeries(lossChart, data.series.loss);
+            }
+            
+            // Subscribe to status and metrics pushed over Server-Sent Events;
+            // the browser reconnects by itself if the stream drops
+            function subscribeToEvents() {
+                const events = new EventSource('/api/events');
+                events.addEventListener('status', (event) => renderStatus(JSON.parse(event.data)));
+                events.addEventListener('metrics', (event) => renderMetrics(JSON.parse(event.data)));
+                events.onerror = () => console.error('Event stream interrupted, reconnecting...');
             }
             
             // Classify text
@@ -411,12 +475,8 @@ def create_templates_directory():
                 document.getElementById('startRoundBtn').addEventListener('click', startRound);
                 document.getElementById('classifyBtn').addEventListener('click', classifyText);
                 
-                // Update status and metrics initially and then periodically
-                updateStatus();
-                updateMetrics();
-                
-                setInterval(updateStatus, 5000);  // Update status every 5 seconds
-                setInterval(updateMetrics, 10000);  // Update metrics every 10 seconds
+                // Status and metrics are pushed by the dashboard server
+                subscribeToEvents();
             }
             
             // Start when page loads
@@ -0,0 +1,106 @@
+# dashboard/poller.py
+import json
+import queue
+import threading
+
+class SnapshotPoller:
+    """Polls the federated server from one thread and fans the results out
+
+    The latest server status and downsampled metric series are cached as
+    JSON, and every change is pushed to the subscribed queues (one per
+    open dashboard). Upstream load therefore does not depend on the number
+    of viewers. Metrics only change when a round completes, so they are
+    re-fetched only when the status reports a new round. Requests go
+    through the server's shared HttpTransport.
+    """
+
+    def __init__(self, transport, status_interval=5.0, chart_points=500, max_queued_events=16):
+        self.transport = transport
+        self.status_interval = status_interval
+        self.chart_points = chart_points
+        self.max_queued_events = max_queued_events
+
+        # Latest serialized payload of each event type
+        self.lock = threading.Lock()
+        self.latest = {}
+        self.subscribers = set()
+        self.metrics_round = None
+
+        self.stop_event = threading.Event()
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    def subscribe(self):
+        """Register a new viewer; returns its event queue"""
+        subscriber = queue.Queue(maxsize=self.max_queued_events)
+        with self.lock:
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def snapshot(self):
+        """Cached (event, data) pairs, for a viewer that has just connected"""
+        with self.lock:
+            return list(self.latest.items())
+
+    def cached(self, event):
+        """Cached payload of one event type as a Python object, or None"""
+        with self.lock:
+            data = self.latest.get(event)
+        return json.loads(data) if data is not None else None
+
+    def _publish(self, event, payload):
+        """Cache a payload and queue it for every viewer if it changed"""
+        data = json.dumps(payload, sort_keys=True)
+        with self.lock:
+            if self.latest.get(event) == data:
+                return
+            self.latest[event] = data
+            subscribers = list(self.subscribers)
+
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait((event, data))
+            except queue.Full:
+                # A stalled viewer only misses intermediate snapshots: its
+                # backlog is replaced by the latest payload of every event
+                # type, so e.g. the round's only metrics event is not lost
+                self._resync(subscriber)
+
+    def _resync(self, subscriber):
+        """Replace a full queue's contents with the current snapshot"""
+        while True:
+            try:
+                subscriber.get_nowait()
+            except queue.Empty:
+                break
+        for item in self.snapshot():
+            try:
+                subscriber.put_nowait(item)
+            except queue.Full:
+                break
+
+    def _poll(self):
+        # No retries, the next poll comes soon enough
+        response = self.transport.get('/get_status', retry=False)
+        status = response.json()
+        self._publish('status', status)
+
+        if status.get('round') != self.metrics_round:
+            response = self.transport.get('/get_metrics', params={'points': self.chart_points}, retry=False)
+            self._publish('metrics', response.json())
+            self.metrics_round = status.get('round')
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                self._poll()
+            except Exception as e:
+                self._publish('status', {'error': str(e)})
+            self.stop_event.wait(self.status_interval)
+
+    def stop(self):
+        self.stop_event.set()
@@ -5,10 +5,14 @@ import threading
 import time
 import json
 import random
-from server.server import run_server
+from server.server import run_server, get_server
 from client.client import FederatedClient
+from client.transport import InProcessTransport
 from client.api import run_client_api
 from dashboard.app import run_dashboard
+from models.text_classifier import MODEL_BACKENDS, DEFAULT_BACKEND
+from utils.communication import WIRE_DTYPES
+from utils import instrumentation
 
 def setup_sample_data(data_dir, num_samples=50):
     """Create sample text data for initial testing"""
@@ -107,21 +111,101 @@ def run_in_thread(target, args=()):
     thread.start()
     return thread
 
+def run_simulation(args):
+    """Simulate rounds with many virtual clients and report how they scale"""
+    from simulation.engine import Simulation, find_client_dirs, summarize
+    
+    client_dirs = find_client_dirs(args.data_dir)
+    if not client_dirs:
+        setup_sample_data(os.path.join(args.data_dir, 'client1'))
+        setup_sample_data(os.path.join(args.data_dir, 'client2'))
+        client_dirs = find_client_dirs(args.data_dir)
+    print(f"Simulating with data from {len(client_dirs)} client directories")
+    
+    runs = []
+    for num_clients in args.num_clients:
+        simulation = Simulation(
+            client_dirs, num_clients,
+            workers=args.workers,
+            participation=args.participation,
+            wire_dtype=args.wire_dtype,
+            bootstrap_size=args.bootstrap_size,
+            work_dir=os.path.join(args.data_dir, '.simulation', f"clients_{num_clients}")
+        )
+        results = simulation.run(args.rounds)
+        for result in results:
+            print(f"clients={num_clients} round={result['round']} "
+                  f"time={result['round_seconds']:.2f}s aggregate={result['aggregate_seconds'] * 1000:.1f}ms "
+                  f"up={result['bytes_up'] / 1e6:.2f}MB down={result['bytes_down'] / 1e6:.2f}MB "
+                  f"averaged={result['updates_averaged']}/{result['updates_received']} "
+                  f"accuracy={result['global_accuracy']}")
+        runs.append({
+            'summary': summarize(results, num_clients, simulation.bootstrap_examples),
+            'rounds': results
+        })
+    
+    print(f"{'clients':>8} {'round s':>9} {'agg ms':>8} {'up MB':>9} {'down MB':>9} {'accuracy':>9}")
+    for run in runs:
+        summary = run['summary']
+        if not summary['rounds']:
+            print(f"{summary['num_clients']:>8} no rounds run")
+            continue
+        accuracy = summary['final_global_accuracy']
+        print(f"{summary['num_clients']:>8} {summary['mean_round_seconds']:>9.2f} "
+              f"{summary['mean_aggregate_seconds'] * 1000:>8.1f} {summary['bytes_up_per_round'] / 1e6:>9.2f} "
+              f"{summary['bytes_down_per_round'] / 1e6:>9.2f} {accuracy if accuracy is not None else float('nan'):>9.3f}")
+    
+    bootstrap_examples = max(run['summary']['bootstrap_examples'] for run in runs) if runs else 0
+    if bootstrap_examples:
+        print(f"Note: the initial global model was fitted on {bootstrap_examples} examples pooled from "
+              f"client data, which a production server does not have, so accuracies are optimistic; "
+              f"--bootstrap-size 0 starts from an unfitted model as in production")
+    
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(runs, file, indent=2)
+
 def main():
     """Main function to run the federated learning system"""
     parser = argparse.ArgumentParser(description='Run Federated Learning System')
-    parser.add_argument('--mode', choices=['server', 'client', 'dashboard', 'all'], default='all',
+    parser.add_argument('--mode', choices=['server', 'client', 'dashboard', 'all', 'simulate'], default='all',
                         help='Component to run (default: all)')
     parser.add_argument('--server-host', default='localhost', help='Server hostname')
     parser.add_argument('--server-port', type=int, default=5000, help='Server port')
     parser.add_argument('--client-id', help='Client ID (generated if not provided)')
     parser.add_argument('--client-port', type=int, default=5001, help='Client API port')
     parser.add_argument('--dashboard-port', type=int, default=8080, help='Dashboard port')
+    parser.add_argument('--max-batch-size', type=int, default=512,
+                        help='Largest number of texts accepted by /classify_batch')
     parser.add_argument('--data-dir', default='./data', help='Data directory')
     parser.add_argument('--setup-data', action='store_true', help='Create sample data')
+    parser.add_argument('--model-backend', choices=sorted(MODEL_BACKENDS), default=DEFAULT_BACKEND,
+                        help=f'Model backend (default: {DEFAULT_BACKEND})')
+    parser.add_argument('--wire-dtype', choices=sorted(WIRE_DTYPES), default='float32',
+                        help='Precision of weights in client updates (default: float32)')
+    parser.add_argument('--transport', choices=['auto', 'http', 'inprocess'], default='auto',
+                        help='How clients reach the server; auto uses in-process calls in '
+                             '--mode all and HTTP otherwise')
+    parser.add_argument('--incremental-training', action='store_true',
+                        help='After the first cycle, train clients only on new data plus a replay sample')
+    parser.add_argument('--no-metrics', action='store_true',
+                        help='Do not record per-stage timings (also FL_METRICS=0); /metrics then returns 404')
+    parser.add_argument('--num-clients', type=int, nargs='+', default=[100],
+                        help='Virtual client counts to simulate, one run each (--mode simulate)')
+    parser.add_argument('--rounds', type=int, default=5, help='Rounds per simulation run')
+    parser.add_argument('--workers', type=int, help='Simulation worker processes (default: CPU count)')
+    parser.add_argument('--participation', type=float, default=1.0,
+                        help='Fraction of virtual clients taking part in each round')
+    parser.add_argument('--bootstrap-size', type=int, default=2000,
+                        help='Examples pooled from client data to fit the initial global model of a '
+                             'simulation (0: start unfitted, as in production)')
+    parser.add_argument('--output', help='Write simulation results as JSON to this file')
     
     args = parser.parse_args()
     
+    if args.no_metrics:
+        instrumentation.set_enabled(False)
+    
     # Create data directories
     os.makedirs(args.data_dir, exist_ok=True)
     
@@ -130,31 +214,47 @@ def main():
         setup_sample_data(os.path.join(args.data_dir, 'client1'))
         setup_sample_data(os.path.join(args.data_dir, 'client2'))
     
+    if args.mode == 'simulate':
+        run_simulation(args)
+        return
+    
     threads = []
     
     # Determine server URL
     server_url = f"http://{args.server_host}:{args.server_port}"
     
+    # Clients co-located with the server hand weights over in memory
+    if args.transport == 'inprocess' and args.mode != 'all':
+        parser.error('--transport inprocess requires --mode all')
+    in_process = args.mode == 'all' and args.transport != 'http'
+    
     # Start components based on mode
     if args.mode in ['server', 'all']:
         print(f"Starting server on port {args.server_port}...")
-        threads.append(run_in_thread(run_server, args=(args.server_host, args.server_port)))
+        threads.append(run_in_thread(run_server, args=(args.server_host, args.server_port, args.model_backend)))
     
     # Wait a moment for server to start if we're starting clients too
     if args.mode in ['client', 'all']:
         if args.mode == 'all':
             time.sleep(2)  # Give server time to start
         
+        def client_transport():
+            return InProcessTransport(get_server(args.model_backend)) if in_process else None
+        
         # Start clients
         client1_data_dir = os.path.join(args.data_dir, 'client1')
         client1 = FederatedClient(
             server_url=server_url,
             data_source_path=client1_data_dir,
-            client_id=args.client_id or "client1"
+            client_id=args.client_id or "client1",
+            model_backend=args.model_backend,
+            wire_dtype=args.wire_dtype,
+            transport=client_transport()
         )
+        client1.incremental_training = args.incremental_training
         
         print(f"Starting client API on port {args.client_port}...")
-        threads.append(run_in_thread(run_client_api, args=(client1, args.server_host, args.client_port)))
+        threads.append(run_in_thread(run_client_api, args=(client1, args.server_host, args.client_port, args.max_batch_size)))
         
         print(f"Starting client training thread...")
         threads.append(run_in_thread(client1.run_continuous, args=(60,)))  # Run every minute
@@ -165,8 +265,12 @@ def main():
             client2 = FederatedClient(
                 server_url=server_url,
                 data_source_path=client2_data_dir,
-                client_id="client2"
+                client_id="client2",
+                model_backend=args.model_backend,
+                wire_dtype=args.wire_dtype,
+                transport=client_transport()
             )
+            client2.incremental_training = args.incremental_training
             
             print(f"Starting second client training thread...")
             threads.append(run_in_thread(client2.run_continuous, args=(70,)))  # Slight offset
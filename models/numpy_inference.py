@@ -0,0 +1,91 @@
+# models/numpy_inference.py
+import re
+import numpy as np
+
+class CompiledTextClassifier:
+    """Inference-only copy of a fitted SimpleTextClassifier in plain NumPy
+
+    Holds the vocabulary as a dict, the float32 coefficients transposed to
+    (num_features, num_classes) and the precompiled token regex, and computes
+    the same probabilities as CountVectorizer.transform + predict_proba
+    without sklearn's input validation or sparse matrix construction.
+    """
+
+    def __init__(self, vocabulary, coef, intercept, classes, num_classes,
+                 token_pattern=r"(?u)\b\w\w+\b", lowercase=True):
+        self.vocabulary = dict(vocabulary)
+        self.coef_t = np.ascontiguousarray(np.asarray(coef, dtype=np.float32).T)
+        self.intercept = np.asarray(intercept, dtype=np.float32)
+        self.classes = np.asarray(classes).astype(int)
+        self.num_classes = num_classes
+        self.token_re = re.compile(token_pattern)
+        self.lowercase = lowercase
+
+    @classmethod
+    def from_classifier(cls, classifier):
+        """Export a fitted SimpleTextClassifier, or return None if unfitted"""
+        if not classifier.is_fitted or not classifier.has_vocabulary():
+            return None
+
+        vectorizer = classifier.vectorizer
+        model = classifier.model
+        return cls(
+            vectorizer.vocabulary_,
+            model.coef_,
+            model.intercept_,
+            model.classes_,
+            classifier.num_classes,
+            token_pattern=vectorizer.token_pattern,
+            lowercase=vectorizer.lowercase
+        )
+
+    def token_indices(self, texts):
+        """Row and feature index of every in-vocabulary token in texts"""
+        rows = []
+        cols = []
+        vocabulary_get = self.vocabulary.get
+        for row, text in enumerate(texts):
+            if self.lowercase:
+                text = text.lower()
+            for token in self.token_re.findall(text):
+                idx = vocabulary_get(token)
+                if idx is not None:
+                    rows.append(row)
+                    cols.append(idx)
+        return np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)
+
+    def decision_function(self, texts):
+        """Linear scores of shape (n, num_model_classes)"""
+        rows, cols = self.token_indices(texts)
+        num_texts = len(texts)
+
+        if num_texts == 1:
+            return (self.intercept + self.coef_t[cols].sum(axis=0))[np.newaxis, :]
+
+        # Sparse dot product: sum the coefficient rows of each text's tokens
+        contributions = self.coef_t[cols]
+        scores = np.empty((num_texts, self.coef_t.shape[1]), dtype=np.float32)
+        for c in range(self.coef_t.shape[1]):
+            scores[:, c] = np.bincount(rows, weights=contributions[:, c], minlength=num_texts)
+        scores += self.intercept
+        return scores
+
+    def predict(self, texts):
+        """Class probabilities of shape (n, num_classes), like SimpleTextClassifier.predict"""
+        scores = self.decision_function(texts)
+
+        if len(self.classes) <= 2:
+            # Binary logistic regression has a single coefficient row
+            positive = 1.0 / (1.0 + np.exp(-scores[:, 0]))
+            probs = np.column_stack([1.0 - positive, positive])
+        else:
+            scores -= scores.max(axis=1, keepdims=True)
+            probs = np.exp(scores)
+            probs /= probs.sum(axis=1, keepdims=True)
+
+        if len(self.classes) != self.num_classes or not np.array_equal(self.classes, np.arange(self.num_classes)):
+            full_probs = np.zeros((probs.shape[0], self.num_classes), dtype=probs.dtype)
+            full_probs[:, self.classes] = probs
+            probs = full_probs
+
+        return probs
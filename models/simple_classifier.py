@@ -1,27 +1,91 @@
 # models/simple_classifier.py
+import warnings
 import numpy as np
+import scipy.sparse as sp
+from sklearn.exceptions import ConvergenceWarning
 from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.linear_model import LogisticRegression
 
 class SimpleTextClassifier:
-    def __init__(self, num_classes=5):
-        self.vectorizer = CountVectorizer(max_features=1000)
-        self.model = LogisticRegression(max_iter=100)
+    # Order of the values returned by evaluate(), mirroring Keras
+    metrics_names = ['loss', 'accuracy']
+    
+    def __init__(self, num_classes=5, max_iter=100, warm_start_max_iter=20, max_features=1000):
+        # Vocabulary size, and with it the number of coefficients per class
+        self.vectorizer = CountVectorizer(max_features=max_features)
+        self.model = LogisticRegression(max_iter=max_iter)
         self.is_fitted = False
         self.num_classes = num_classes
+        self.max_iter = max_iter
+        self.warm_start_max_iter = warm_start_max_iter
         
-    def fit(self, texts, labels):
-        # Vectorize the texts
-        X = self.vectorizer.fit_transform(texts)
+    def has_vocabulary(self):
+        """Whether the vectorizer already has a (local or global) vocabulary"""
+        return bool(getattr(self.vectorizer, 'vocabulary_', None))
+    
+    def can_warm_start(self, labels):
+        """Check that the current coefficients can seed training on these labels"""
+        if not self.is_fitted or not self.has_vocabulary():
+            return False
+        
+        coef = getattr(self.model, 'coef_', None)
+        if coef is None or coef.shape != (self.num_classes, len(self.vectorizer.vocabulary_)):
+            return False
+        
+        # LogisticRegression derives its classes from the labels, so every
+        # class has to be present for the coefficient rows to line up
+        return np.array_equal(np.unique(labels), np.arange(self.num_classes))
+    
+    def _pad_missing_classes(self, X, labels):
+        """Add an empty, near zero-weight example for every absent class
+        
+        Clients with skewed data often lack some classes. Without them the
+        fitted coefficients would have fewer rows than the global model's and
+        the update could not be averaged; with them every class keeps its row
+        and training can warm start from the global model.
+        """
+        missing = np.setdiff1d(np.arange(self.num_classes), labels)
+        sample_weight = np.ones(len(labels))
+        if len(missing) == 0 or not np.all(np.isin(labels, np.arange(self.num_classes))):
+            return X, labels, sample_weight
+        
+        X = sp.vstack([X, sp.csr_matrix((len(missing), X.shape[1]), dtype=X.dtype)], format='csr')
+        labels = np.concatenate([labels, missing])
+        sample_weight = np.concatenate([sample_weight, np.full(len(missing), 1e-6)])
+        return X, labels, sample_weight
+        
+    def fit(self, texts, labels, epochs=None, batch_size=None, verbose=0, warm_start=True):
+        """Train on texts; epochs, if given, caps the solver iterations"""
+        labels = np.asarray(labels)
+        
+        # Keep an existing vocabulary so coefficients stay aligned with the
+        # global model; only build one when we have none yet
+        if self.has_vocabulary():
+            X = self.vectorizer.transform(texts)
+        else:
+            X = self.vectorizer.fit_transform(texts)
+        X, labels, sample_weight = self._pad_missing_classes(X, labels)
+        
+        # Continue from the current coef_/intercept_ instead of starting over
+        warm = warm_start and self.can_warm_start(labels)
+        self.model.warm_start = warm
+        self.model.max_iter = self.warm_start_max_iter if warm else self.max_iter
+        if epochs is not None:
+            self.model.max_iter = max(1, min(int(epochs), self.model.max_iter))
         
         # Train the model
-        self.model.fit(X, labels)
+        with warnings.catch_warnings():
+            if warm:
+                # A capped warm-start refit is not expected to fully converge
+                warnings.simplefilter('ignore', ConvergenceWarning)
+            self.model.fit(X, labels, sample_weight=sample_weight)
         self.is_fitted = True
         
         # Mock training history for compatibility
         history = {
             'accuracy': [0.7],
-            'loss': [0.5]
+            'loss': [0.5],
+            'epochs': [int(np.max(self.model.n_iter_))]
         }
         
         return history
@@ -37,20 +101,33 @@ class SimpleTextClassifier:
         # Get probabilities
         probs = self.model.predict_proba(X)
         
+        # A locally fitted model may not have seen every class; give the
+        # columns the class ids as indices
+        classes = self.model.classes_
+        if len(classes) != self.num_classes or not np.array_equal(classes, np.arange(self.num_classes)):
+            full_probs = np.zeros((probs.shape[0], self.num_classes), dtype=probs.dtype)
+            full_probs[:, classes.astype(int)] = probs
+            probs = full_probs
+        
         return probs
     
-    def evaluate(self, texts, labels):
+    def evaluate(self, texts, labels, verbose=0, return_dict=False):
         if not self.is_fitted:
-            return [1.0, 0.4]  # [loss, accuracy]
+            results = [1.0, 0.4]  # [loss, accuracy]
+        else:
+            # Vectorize the texts
+            X = self.vectorizer.transform(texts)
             
-        # Vectorize the texts
-        X = self.vectorizer.transform(texts)
-        
-        # Evaluate
-        accuracy = self.model.score(X, labels)
+            # Evaluate
+            accuracy = self.model.score(X, labels)
+            
+            # Loss and accuracy
+            results = [0.8, accuracy]
         
-        # Return loss and accuracy
-        return [0.8, accuracy]
+        # Like Keras, return_dict gives the results keyed by metric name
+        if return_dict:
+            return dict(zip(self.metrics_names, results))
+        return results
     
     def get_weights(self):
         """Get model weights in a serializable format"""
@@ -64,11 +141,11 @@ class SimpleTextClassifier:
         # Get vectorizer vocabulary
         vocab = self.vectorizer.vocabulary_
         
-        # Convert to serializable format
+        # Convert to serializable format; parameters are exchanged as float32
         weights = [
-            np.array(coef).astype(float),
-            np.array(intercept).astype(float),
-            np.array(list(vocab.items()), dtype=object)
+            np.asarray(coef, dtype=np.float32),
+            np.asarray(intercept, dtype=np.float32),
+            np.array([(word, int(idx)) for word, idx in vocab.items()], dtype=object)
         ]
         
         return weights
@@ -1,54 +1,110 @@
 # models/text_classifier.py
-import tensorflow as tf
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Dense, Embedding, GlobalAveragePooling1D
-from tensorflow.keras.optimizers import Adam
+import os
 from models.simple_classifier import SimpleTextClassifier
 
+# Model backends by name; each factory takes
+# (vocab_size, embedding_dim, max_sequence_length, num_classes).
+# Factories import their framework themselves, so TensorFlow is only loaded
+# once a Keras backend is actually used.
+MODEL_BACKENDS = {}
 
-def create_model(vocab_size=10000, embedding_dim=16, max_sequence_length=250, num_classes=5):
+# Backend used when none is given; can be overridden with FL_MODEL_BACKEND
+DEFAULT_BACKEND = 'sklearn'
 
+
+def register_backend(name):
+    """Decorator registering a model factory under a backend name"""
+    def decorator(factory):
+        MODEL_BACKENDS[name] = factory
+        return factory
+    return decorator
+
+
+def resolve_backend(backend=None):
+    """Return the backend name to use, validating it against the registry"""
+    backend = backend or os.environ.get('FL_MODEL_BACKEND', DEFAULT_BACKEND)
+    if backend not in MODEL_BACKENDS:
+        raise ValueError(f"Unknown model backend '{backend}', choose from {sorted(MODEL_BACKENDS)}")
+    return backend
+
+
+def uses_token_sequences(model):
+    """Whether a model takes padded token sequences rather than raw texts"""
+    return not isinstance(model, SimpleTextClassifier)
+
+
+@register_backend('sklearn')
+def create_sklearn_model(vocab_size, embedding_dim, max_sequence_length, num_classes):
     """Create a simple text classification model"""
     return SimpleTextClassifier(num_classes=num_classes)
 
+
+@register_backend('keras')
+def create_keras_model(vocab_size, embedding_dim, max_sequence_length, num_classes):
     """Create a simple text classification model suitable for Raspberry Pi"""
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import Input, Dense, Embedding, GlobalAveragePooling1D
+    from tensorflow.keras.optimizers import Adam
+
     model = Sequential([
-        # Use efficient embedding dimension
-        Embedding(input_dim=vocab_size, output_dim=embedding_dim, input_length=max_sequence_length),
+        # Integer token ids; also builds the weights so they can be exchanged
+        # before the first fit
+        Input(shape=(max_sequence_length,), dtype='int32'),
         
+        # Use efficient embedding dimension
+        Embedding(input_dim=vocab_size, output_dim=embedding_dim),
+
         # Global pooling is more efficient than LSTM/GRU for resource-constrained devices
         GlobalAveragePooling1D(),
-        
+
         # Small dense layers
         Dense(32, activation='relu'),
         Dense(num_classes, activation='softmax')
     ])
-    
+
     # Compile the model
     model.compile(
         optimizer=Adam(learning_rate=0.001),
         loss='sparse_categorical_crossentropy',
         metrics=['accuracy']
     )
-    
+
     return model
 
-# Alternative lightweight model if the above is too resource-intensive
-def create_tiny_model(vocab_size=5000, embedding_dim=8, max_sequence_length=100, num_classes=5):
-    """Create a tiny model for resource-constrained environments"""
-    return SimpleTextClassifier(num_classes=num_classes)
+
+@register_backend('keras_tiny')
+def create_keras_tiny_model(vocab_size, embedding_dim, max_sequence_length, num_classes):
     """Create an extremely lightweight model for very constrained devices"""
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import Input, Dense, Embedding, GlobalAveragePooling1D
+    from tensorflow.keras.optimizers import Adam
+
     model = Sequential([
-        Embedding(input_dim=vocab_size, output_dim=embedding_dim, input_length=max_sequence_length),
+        Input(shape=(max_sequence_length,), dtype='int32'),
+        Embedding(input_dim=vocab_size, output_dim=embedding_dim),
         GlobalAveragePooling1D(),
         Dense(16, activation='relu'),
         Dense(num_classes, activation='softmax')
     ])
-    
+
     model.compile(
         optimizer=Adam(learning_rate=0.001),
         loss='sparse_categorical_crossentropy',
         metrics=['accuracy']
     )
-    
-    return model
\ No newline at end of file
+
+    return model
+
+
+def create_model(vocab_size=10000, embedding_dim=16, max_sequence_length=250, num_classes=5, backend=None):
+    """Create a text classification model with the selected backend"""
+    factory = MODEL_BACKENDS[resolve_backend(backend)]
+    return factory(vocab_size, embedding_dim, max_sequence_length, num_classes)
+
+# Alternative lightweight model if the above is too resource-intensive
+def create_tiny_model(vocab_size=5000, embedding_dim=8, max_sequence_length=100, num_classes=5, backend=None):
+    """Create a tiny model for resource-constrained environments"""
+    backend = resolve_backend(backend)
+    if backend == 'keras':
+        backend = 'keras_tiny'
+    return create_model(vocab_size, embedding_dim, max_sequence_length, num_classes, backend=backend)
@@ -0,0 +1,71 @@
+# models/tflite_model.py
+import threading
+import numpy as np
+
+
+def export_tflite(model, max_sequence_length=250, vocab_size=10000, num_calibration_samples=100):
+    """Convert a Keras text model to an int8-quantized TFLite flatbuffer
+
+    Weights and activations are quantized to int8. Calibration uses random
+    token sequences because the server holds no training text; the token ids
+    stay int32 and the output stays float32 so callers need no rescaling.
+    """
+    import tensorflow as tf
+
+    def representative_dataset():
+        rng = np.random.default_rng(0)
+        for _ in range(num_calibration_samples):
+            length = rng.integers(1, max_sequence_length + 1)
+            sequence = np.zeros((1, max_sequence_length), dtype=np.int32)
+            sequence[0, -length:] = rng.integers(1, vocab_size, size=length)
+            yield [sequence]
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    return converter.convert()
+
+
+def _interpreter_class():
+    """Prefer the small tflite_runtime package, fall back to full TensorFlow"""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class TFLiteTextClassifier:
+    """Runs a TFLite text model with the same predict() interface as the others"""
+
+    def __init__(self, model_content, num_threads=None):
+        Interpreter = _interpreter_class()
+        self.interpreter = Interpreter(model_content=model_content, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()[0]
+        self.output_details = self.interpreter.get_output_details()[0]
+        self.batch_size = int(self.input_details['shape'][0])
+
+        # The interpreter holds mutable tensors and is not thread-safe
+        self.lock = threading.Lock()
+
+    def predict(self, sequences, verbose=0):
+        """Class probabilities for a batch of padded token sequences"""
+        sequences = np.asarray(sequences, dtype=self.input_details['dtype'])
+
+        with self.lock:
+            if sequences.shape[0] != self.batch_size:
+                self.interpreter.resize_tensor_input(self.input_details['index'], sequences.shape)
+                self.interpreter.allocate_tensors()
+                self.batch_size = sequences.shape[0]
+
+            self.interpreter.set_tensor(self.input_details['index'], sequences)
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self.output_details['index'])
+
+        # Undo output quantization if the converter left the output as int8
+        scale, zero_point = self.output_details.get('quantization', (0.0, 0))
+        if scale:
+            output = (output.astype(np.float32) - zero_point) * scale
+        return np.array(output, dtype=np.float32)
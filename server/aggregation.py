@@ -0,0 +1,73 @@
+# server/aggregation.py
+import numpy as np
+from utils.communication import PARAM_DTYPE
+
+
+def is_numeric(array):
+    """Whether a weight array holds numbers that can be averaged"""
+    return np.issubdtype(np.asarray(array).dtype, np.number)
+
+
+def same_layout(weights, reference):
+    """Check that two weight lists can be averaged element-wise
+    
+    Numeric arrays must have the same shape; non-numeric arrays (such as the
+    vectorizer vocabulary) must be identical, otherwise the coefficients they
+    index do not refer to the same features.
+    """
+    if len(weights) != len(reference):
+        return False
+    
+    for w, ref in zip(weights, reference):
+        w, ref = np.asarray(w), np.asarray(ref)
+        if w.shape != ref.shape:
+            return False
+        if not is_numeric(ref) and not np.array_equal(w.astype(str), ref.astype(str)):
+            return False
+    
+    return True
+
+
+def federated_average(weights_list, sample_weights=None, reference=None):
+    """Average client weights element-wise (FedAvg)
+    
+    Each update counts in proportion to its entry in sample_weights (e.g. the
+    number of examples it was trained on); equal weights if not given.
+    reference is the layout updates must match, normally the current global
+    model's weights; without one the first update is used. Updates that do
+    not match it are left out, and non-numeric entries (the vocabulary) are
+    copied from the reference. Sums are accumulated in float64 and the
+    averages returned as PARAM_DTYPE. Returns the averaged weights and the
+    number of updates that went into them; (None, 0) if no update matches.
+    """
+    if sample_weights is None:
+        sample_weights = [1.0] * len(weights_list)
+    
+    if reference is None:
+        reference = weights_list[0]
+    compatible = [
+        (weights, sample_weight)
+        for weights, sample_weight in zip(weights_list, sample_weights)
+        if same_layout(weights, reference)
+    ]
+    if not compatible:
+        return None, 0
+    
+    coefficients = np.array([sample_weight for _, sample_weight in compatible], dtype=float)
+    if coefficients.sum() <= 0:
+        coefficients = np.ones(len(compatible))
+    coefficients /= coefficients.sum()
+    
+    average_weights = []
+    for i, ref in enumerate(reference):
+        ref = np.asarray(ref)
+        if is_numeric(ref):
+            # Accumulate one update at a time rather than stacking them all
+            total = np.zeros(ref.shape, dtype=np.float64)
+            for (weights, _), coefficient in zip(compatible, coefficients):
+                total += coefficient * np.asarray(weights[i], dtype=np.float64)
+            average_weights.append(total.astype(PARAM_DTYPE))
+        else:
+            average_weights.append(ref)
+    
+    return average_weights, len(compatible)
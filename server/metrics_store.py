@@ -0,0 +1,171 @@
+# server/metrics_store.py
+import numpy as np
+from threading import Lock
+
+
+def lttb_indices(x, y, threshold):
+    """Indices of the points kept by Largest-Triangle-Three-Buckets
+
+    Keeps the first and last point and, from each of threshold - 2 equal
+    buckets in between, the point forming the largest triangle with the
+    point kept from the previous bucket and the mean of the next bucket.
+    This preserves the visual shape of a series (peaks and dips) with a
+    fixed number of points. All indices are returned if the series is
+    already short enough.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Bucket boundaries over the points between the first and the last
+    edges = (1 + np.arange(threshold - 1) * (n - 2) / (threshold - 2)).astype(int)
+    edges[-1] = n - 1
+
+    kept = np.empty(threshold, dtype=np.intp)
+    kept[0] = 0
+    kept[-1] = n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+            mean_x = x[next_start:next_end].mean()
+            mean_y = y[next_start:next_end].mean()
+        else:
+            mean_x, mean_y = x[n - 1], y[n - 1]
+
+        areas = np.abs(
+            (x[previous] - mean_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (mean_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        kept[i + 1] = previous
+    return kept
+
+
+class MetricsStore:
+    """Bounded, columnar history of per-round training metrics
+
+    Rows are kept in fixed-size numpy ring buffers, one column per field, so
+    memory stays constant however many rounds run; once capacity rows are
+    stored the oldest round is overwritten. Rounds are appended in increasing
+    order, which lets rows(since=...) find new rows with a binary search.
+    Metric names seen for the first time get a new column, with NaN for the
+    rounds that did not report them.
+    """
+
+    def __init__(self, capacity=10000):
+        self.capacity = capacity
+        self.rounds = np.zeros(capacity, dtype=np.int64)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.num_clients = np.zeros(capacity, dtype=np.int32)
+        self.metrics = {}
+
+        # Ring buffer position of the oldest row and number of rows held
+        self.start = 0
+        self.size = 0
+        self.lock = Lock()
+
+        # Downsampled series by number of points, valid until the next append
+        self._downsampled = {}
+
+    def __len__(self):
+        return self.size
+
+    def append(self, round_number, timestamp, metrics, num_clients):
+        """Add the row of a completed round, overwriting the oldest if full"""
+        with self.lock:
+            if self.size < self.capacity:
+                position = (self.start + self.size) % self.capacity
+                self.size += 1
+            else:
+                position = self.start
+                self.start = (self.start + 1) % self.capacity
+
+            self.rounds[position] = round_number
+            self.timestamps[position] = timestamp
+            self.num_clients[position] = num_clients
+
+            for name in metrics:
+                if name not in self.metrics:
+                    self.metrics[name] = np.full(self.capacity, np.nan)
+            for name, column in self.metrics.items():
+                column[position] = metrics.get(name, np.nan)
+
+            self._downsampled.clear()
+
+    def _positions(self):
+        """Buffer positions of all rows, oldest first"""
+        return (self.start + np.arange(self.size)) % self.capacity
+
+    def latest_round(self):
+        """Round of the newest row, or None if empty"""
+        with self.lock:
+            if self.size == 0:
+                return None
+            return int(self.rounds[(self.start + self.size - 1) % self.capacity])
+
+    def oldest_round(self):
+        """Round of the oldest row still held, or None if empty"""
+        with self.lock:
+            if self.size == 0:
+                return None
+            return int(self.rounds[self.start])
+
+    def rows(self, since=None, limit=None):
+        """Rows of rounds after since, oldest first, at most limit of them
+
+        Each row is a dict with round, timestamp, metrics and num_clients, the
+        format the server has always reported its history in.
+        """
+        with self.lock:
+            positions = self._positions()
+            if since is not None:
+                first = np.searchsorted(self.rounds[positions], since, side='right')
+                positions = positions[first:]
+            if limit is not None:
+                positions = positions[:max(limit, 0)]
+
+            rows = []
+            for position in positions:
+                metrics = {
+                    name: float(column[position])
+                    for name, column in self.metrics.items()
+                    if not np.isnan(column[position])
+                }
+                rows.append({
+                    'round': int(self.rounds[position]),
+                    'timestamp': float(self.timestamps[position]),
+                    'metrics': metrics,
+                    'num_clients': int(self.num_clients[position])
+                })
+            return rows
+
+    def downsample(self, points):
+        """Every metric as a series of at most points (round, value) pairs
+
+        Series are reduced with LTTB, skipping rounds that did not report the
+        metric, and cached until the next round is appended, so repeated
+        chart requests cost nothing between rounds.
+        """
+        with self.lock:
+            cached = self._downsampled.get(points)
+            if cached is not None:
+                return cached
+
+            positions = self._positions()
+            rounds = self.rounds[positions]
+            series = {}
+            for name, column in self.metrics.items():
+                values = column[positions]
+                reported = ~np.isnan(values)
+                x = rounds[reported].astype(np.float64)
+                y = values[reported]
+                kept = lttb_indices(x, y, points)
+                series[name] = {
+                    'rounds': rounds[reported][kept].tolist(),
+                    'values': y[kept].tolist()
+                }
+
+            self._downsampled[points] = series
+            return series
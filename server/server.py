@@ -3,17 +3,42 @@ import os
 import json
 import time
 import numpy as np
-from flask import Flask, request, jsonify
-from threading import Thread
-import tensorflow as tf
-from models.text_classifier import create_model
+from flask import Flask, Response, request, jsonify, send_file
+from threading import Thread, Lock
+from models.text_classifier import create_model, resolve_backend, uses_token_sequences
+from models.tflite_model import export_tflite
+from server.aggregation import federated_average, same_layout
+from server.uploads import UploadManager, UploadError
+from server.metrics_store import MetricsStore
+from utils.communication import weights_fingerprint, encode_update, decode_update, to_param_dtype, apply_weights_delta
+from utils import instrumentation
 
 app = Flask(__name__)
 
+# Largest number of metrics rows returned by one /get_metrics call
+METRICS_PAGE_SIZE = 1000
+
+# Per-stage timings and counters, exported on /metrics
+STAGE_SECONDS = instrumentation.histogram('fl_server_stage_seconds', 'Time spent in each server stage', ['stage'])
+UPDATES_RECEIVED = instrumentation.counter('fl_server_updates_received_total', 'Client updates received')
+UPDATES_AVERAGED = instrumentation.counter('fl_server_updates_averaged_total',
+                                           'Client updates averaged into a global model')
+UPDATES_DROPPED = instrumentation.counter('fl_server_updates_dropped_total',
+                                          'Client updates left out for not matching the global model layout')
+ROUNDS_COMPLETED = instrumentation.counter('fl_server_rounds_total', 'Completed aggregation rounds')
+
 class FederatedServer:
-    def __init__(self, model_path='./server/global_model'):
+    def __init__(self, model_path='./server/global_model', round_time_budget=30, model_backend=None,
+                 metrics_capacity=10000):
         self.model_path = model_path
-        self.global_model = create_model()
+        # Seconds clients may spend on local training each round
+        self.round_time_budget = round_time_budget
+        self.model_backend = resolve_backend(model_backend)
+        self.global_model = create_model(backend=self.model_backend)
+        
+        # Quantized TFLite exports of the global model, one file per round
+        self.tflite_dir = os.path.join(os.path.dirname(model_path), 'tflite')
+        self.tflite_lock = Lock()
         
         # Remove these lines:
         # import numpy as np
@@ -23,8 +48,11 @@ class FederatedServer:
         self.client_updates = {}
         self.clients_ready = set()
         self.round_number = 0
-        self.metrics_history = []
+        # Per-round metrics of the last metrics_capacity rounds
+        self.metrics_history = MetricsStore(capacity=metrics_capacity)
         self.is_training = False
+        self.model_hash = weights_fingerprint(self.global_model.get_weights())
+        self.uploads = UploadManager(os.path.join(os.path.dirname(model_path), 'uploads'))
         # self.save_global_model()  # Also remove this line for now
         
     def save_global_model(self):
@@ -34,71 +62,208 @@ class FederatedServer:
         # Get model weights
         weights = self.global_model.get_weights()
         
-        # Save as NumPy arrays
-        np.save(self.model_path + '.weights.npy', weights, allow_pickle=True)
+        # Same float32 .npz format as updates, so no pickled object arrays
+        checkpoint_path = self.model_path + '.weights.npz'
+        with STAGE_SECONDS.time(stage='checkpoint'):
+            with open(checkpoint_path + '.tmp', 'wb') as file:
+                file.write(encode_update(weights, {'round': self.round_number, 'backend': self.model_backend}))
+            os.replace(checkpoint_path + '.tmp', checkpoint_path)
         
     def load_global_model(self):
         """Load the global model from disk if it exists"""
-        if os.path.exists(self.model_path + '.weights.npy'):
-            try:
-                weights = np.load(self.model_path + '.weights.npy', allow_pickle=True)
-                self.global_model.set_weights(weights)
-            except Exception as e:
-                print(f"Error loading model weights: {e}")
+        checkpoint_path = self.model_path + '.weights.npz'
+        legacy_path = self.model_path + '.weights.npy'
+        try:
+            if os.path.exists(checkpoint_path):
+                weights, _ = decode_update(checkpoint_path)
+            elif os.path.exists(legacy_path):
+                # Checkpoints written before the .npz format
+                weights = to_param_dtype(np.load(legacy_path, allow_pickle=True))
+            else:
+                return
+            self.global_model.set_weights(weights)
+            self.model_hash = weights_fingerprint(self.global_model.get_weights())
+        except Exception as e:
+            print(f"Error loading model weights: {e}")
             
     def aggregate_models(self):
-        """Federated averaging of client model updates"""
+        """Federated averaging of client model updates
+        
+        Returns the number of updates that went into the new global model.
+        """
         if not self.client_updates:
-            return
+            return 0
         
         # Get all weights
         weights = [update["weights"] for update in self.client_updates.values()]
         metrics = [update["metrics"] for update in self.client_updates.values()]
         
-        # Simple averaging of weights
-        average_weights = []
-        for weights_list_tuple in zip(*weights):
-            average_weights.append(
-                np.array([np.array(w) for w in weights_list_tuple]).mean(axis=0)
-            )
+        # Weight each update by the amount of local work behind it
+        sample_weights = [
+            (update.get("work") or {}).get("num_examples", 1)
+            for update in self.client_updates.values()
+        ]
+        # Updates must match the global model (shapes and vocabulary), not
+        # whichever update happened to arrive first; an unfitted global model
+        # has no layout yet, and then the first update sets it
+        reference = None
+        if getattr(self.global_model, 'is_fitted', True):
+            reference = self.global_model.get_weights()
         
-        # Update global model with new weights
-        self.global_model.set_weights(average_weights)
-        self.save_global_model()
+        with STAGE_SECONDS.time(stage='aggregate'):
+            average_weights, num_averaged = federated_average(weights, sample_weights, reference)
+            if average_weights is not None:
+                # Update global model with new weights
+                self.global_model.set_weights(average_weights)
+                self.model_hash = weights_fingerprint(self.global_model.get_weights())
+        if num_averaged < len(weights):
+            layout = reference if reference is not None else weights[0]
+            dropped = [
+                client_id for client_id, update in self.client_updates.items()
+                if not same_layout(update["weights"], layout)
+            ]
+            UPDATES_DROPPED.inc(len(dropped))
+            print(f"Skipped {len(dropped)} update(s) not matching the global model layout: {', '.join(dropped)}")
+        UPDATES_AVERAGED.inc(num_averaged)
+        if average_weights is not None:
+            self.save_global_model()
         
-        # Average metrics for tracking
-        avg_metrics = {}
-        for key in metrics[0].keys():
-            avg_metrics[key] = sum(m[key] for m in metrics) / len(metrics)
+        # Average metrics for tracking, each over the updates that report it
+        totals = {}
+        for m in metrics:
+            for key, value in (m or {}).items():
+                total, count = totals.get(key, (0.0, 0))
+                totals[key] = (total + value, count + 1)
+        avg_metrics = {key: total / count for key, (total, count) in totals.items()}
         
         # Store metrics history
-        self.metrics_history.append({
-            "round": self.round_number,
-            "timestamp": time.time(),
-            "metrics": avg_metrics,
-            "num_clients": len(self.client_updates)
-        })
+        self.metrics_history.append(self.round_number, time.time(), avg_metrics, len(self.client_updates))
         
         # Clear updates for next round
         self.client_updates = {}
         self.clients_ready = set()
         self.round_number += 1
+        ROUNDS_COMPLETED.inc()
+        
+        return num_averaged
         
+    def get_tflite_model(self):
+        """Return (round, path) of the int8 TFLite export of the global model
+        
+        The export is made on first request for a round and reused for the
+        rest of it; older rounds' files are removed. Returns None for
+        backends that have no TFLite form.
+        """
+        if not uses_token_sequences(self.global_model):
+            return None
+        
+        with self.tflite_lock:
+            round_number = self.round_number
+            path = os.path.join(self.tflite_dir, f"round_{round_number}.tflite")
+            if not os.path.exists(path):
+                os.makedirs(self.tflite_dir, exist_ok=True)
+                content = export_tflite(self.global_model)
+                with open(path + '.tmp', 'wb') as file:
+                    file.write(content)
+                os.replace(path + '.tmp', path)
+                
+                for filename in os.listdir(self.tflite_dir):
+                    if filename.endswith('.tflite') and filename != os.path.basename(path):
+                        os.remove(os.path.join(self.tflite_dir, filename))
+            
+            return round_number, os.path.abspath(path)
+    
+    def receive_update(self, client_id, weights, metrics, work=None, delta=False):
+        """Store a client's update for the current round
+        
+        With delta, weights are the client's progress relative to the global
+        model it trained from (updates spooled while offline) and are applied
+        to the current global model, so local work from an older round does
+        not pull the model back to that round. Raises ValueError if the delta
+        does not fit the current global model.
+        """
+        with STAGE_SECONDS.time(stage='ingest'):
+            if delta:
+                base = self.global_model.get_weights() if getattr(self.global_model, 'is_fitted', True) else None
+                if base is None or not same_layout(weights, base):
+                    raise ValueError('Update delta does not match the current global model')
+                weights = apply_weights_delta(weights, base)
+            self.client_updates[client_id] = {
+                "weights": to_param_dtype(weights),
+                "metrics": metrics,
+                "work": work,
+                "round": self.round_number
+            }
+            
+            # Mark this client as ready for next round
+            self.clients_ready.add(client_id)
+        UPDATES_RECEIVED.inc()
+        
+        print(f"Received update from client {client_id}")
+        
+    def status(self):
+        """Current round, model hash and update counts"""
+        return {
+            'round': self.round_number,
+            'model_hash': self.model_hash,
+            'time_budget': self.round_time_budget,
+            'is_training': self.is_training,
+            'clients_ready': list(self.clients_ready),
+            'updates_received': len(self.client_updates),
+        }
+    
+    def accept_heartbeat(self, client_id):
+        """Count a client as ready if its update for this round still stands
+        
+        Returns False if there is no such update (e.g. the server restarted),
+        in which case the client has to send a full update.
+        """
+        update = self.client_updates.get(client_id)
+        if update is None or update.get("round") != self.round_number:
+            return False
+        
+        self.clients_ready.add(client_id)
+        print(f"Received heartbeat from client {client_id}")
+        return True
+    
     def start_training_round(self):
         """Start a new federated training round"""
         self.is_training = True
-        print(f"Starting federated round {self.round_number}")
-        time.sleep(5)  # Give time for clients to connect
-        self.aggregate_models()
-        self.is_training = False
+        try:
+            print(f"Starting federated round {self.round_number}")
+            time.sleep(5)  # Give time for clients to connect
+            self.aggregate_models()
+        finally:
+            self.is_training = False
         print(f"Completed federated round {self.round_number}")
 
+# The server instance is built on first use rather than at import, so
+# importing this module (e.g. from main.py in client mode) stays cheap and
+# run_server can pick the backend before any model is created
+_server = None
+_server_lock = Lock()
+
+def get_server(model_backend=None):
+    """Return the FederatedServer, building it with model_backend if needed
+    
+    Raises ValueError if the server already exists with a different
+    backend; replacing it would discard its model and pending updates.
+    """
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = FederatedServer(model_backend=model_backend)
+        elif model_backend and resolve_backend(model_backend) != _server.model_backend:
+            raise ValueError(f"Server is already running with the '{_server.model_backend}' backend, "
+                             f"not '{model_backend}'")
+        return _server
+
 # Server API routes
-server = FederatedServer()
 
 @app.route('/get_model', methods=['GET'])
 def get_model():
     """Endpoint for clients to download the latest global model"""
+    server = get_server()
     # Get model weights as list of numpy arrays
     model_weights = server.global_model.get_weights()
     
@@ -107,61 +272,167 @@ def get_model():
     
     return jsonify({
         'round': server.round_number,
+        'model_hash': server.model_hash,
+        'time_budget': server.round_time_budget,
+        'backend': server.model_backend,
         'weights': weights_as_lists
     })
 
+@app.route('/get_model_tflite', methods=['GET'])
+def get_model_tflite():
+    """Endpoint for clients to download the global model as int8 TFLite"""
+    server = get_server()
+    export = server.get_tflite_model()
+    if export is None:
+        return jsonify({'error': f"No TFLite export for the '{server.model_backend}' backend"}), 404
+    
+    round_number, path = export
+    response = send_file(path, mimetype='application/octet-stream')
+    response.headers['X-Model-Round'] = str(round_number)
+    return response
+
 @app.route('/submit_update', methods=['POST'])
 def submit_update():
     """Endpoint for clients to submit their model updates"""
+    server = get_server()
     data = request.json
     client_id = data['client_id']
     weights = data['weights']
     metrics = data['metrics']
+    work = data.get('work')
     
     # Convert lists back to numpy arrays
-    weights_as_np = [np.array(w) for w in weights]
+    with STAGE_SECONDS.time(stage='decode'):
+        weights_as_np = [np.array(w) for w in weights]
     
     # Store the update
-    server.client_updates[client_id] = {
-        "weights": weights_as_np,
-        "metrics": metrics
-    }
+    server.receive_update(client_id, weights_as_np, metrics, work)
+    
+    return jsonify({'status': 'success', 'round': server.round_number})
+
+@app.errorhandler(UploadError)
+def handle_upload_error(error):
+    """Report upload errors with the offset the client should resume from"""
+    return jsonify({'status': 'error', 'message': str(error), 'offset': error.offset}), error.status_code
+
+@app.route('/upload/initiate', methods=['POST'])
+def initiate_upload():
+    """Start a resumable chunked upload of a binary model update"""
+    server = get_server()
+    data = request.json
+    session = server.uploads.initiate(data['client_id'], int(data['total_size']), data['sha256'])
+    return jsonify(session)
+
+@app.route('/upload/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    """Return how many bytes of an upload have been received"""
+    server = get_server()
+    return jsonify(server.uploads.status(upload_id))
+
+@app.route('/upload/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """Receive one chunk; the offset and CRC32 come with the request"""
+    server = get_server()
+    offset = request.args.get('offset', type=int)
+    checksum = request.headers.get('X-Chunk-CRC32', '')
+    new_offset = server.uploads.write_chunk(upload_id, offset, request.get_data(cache=False), checksum)
+    return jsonify({'upload_id': upload_id, 'offset': new_offset})
+
+@app.route('/upload/<upload_id>/commit', methods=['POST'])
+def commit_upload(upload_id):
+    """Verify a completed upload and hand the update to the aggregator"""
+    server = get_server()
+    client_id, path = server.uploads.commit(upload_id)
+    try:
+        # Decode straight from the assembled file
+        with STAGE_SECONDS.time(stage='decode'):
+            weights, metadata = decode_update(path)
+    except Exception as e:
+        server.uploads.discard(upload_id)
+        return jsonify({'status': 'error', 'message': f"Invalid update: {e}"}), 422
+    server.uploads.discard(upload_id)
+    
+    try:
+        server.receive_update(client_id, weights, metadata.get('metrics', {}), metadata.get('work'),
+                              delta=metadata.get('delta', False))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': f"Rejected update: {e}"}), 422
+    
+    return jsonify({'status': 'success', 'round': server.round_number})
+
+@app.route('/heartbeat', methods=['POST'])
+def heartbeat():
+    """Endpoint for clients whose data and global model have not changed
     
-    # Mark this client as ready for next round
-    server.clients_ready.add(client_id)
+    The client's update from earlier in this round still stands, so it is
+    counted as ready without re-uploading. If there is no such update (e.g.
+    the server restarted) the client is asked for a full update.
+    """
+    server = get_server()
+    data = request.json
     
-    print(f"Received update from client {client_id}")
+    if not server.accept_heartbeat(data['client_id']):
+        return jsonify({'status': 'update_required', 'round': server.round_number}), 409
     
     return jsonify({'status': 'success', 'round': server.round_number})
 
 @app.route('/get_status', methods=['GET'])
 def get_status():
     """Return the current training status"""
-    return jsonify({
-        'round': server.round_number,
-        'is_training': server.is_training,
-        'clients_ready': list(server.clients_ready),
-        'updates_received': len(server.client_updates),
-    })
+    server = get_server()
+    return jsonify(server.status())
 
 @app.route('/get_metrics', methods=['GET'])
 def get_metrics():
-    """Return the metrics history"""
+    """Return the metrics history of rounds after ?since=, oldest first
+    
+    At most ?limit= rows (capped at METRICS_PAGE_SIZE) are returned;
+    has_more tells the caller to ask again with since set to the last
+    round it received. With ?points=N each metric is instead returned as a
+    series downsampled to at most N points, for charts.
+    """
+    server = get_server()
+    points = request.args.get('points', type=int)
+    if points is not None:
+        points = min(max(points, 3), METRICS_PAGE_SIZE)
+        return jsonify({
+            'series': server.metrics_history.downsample(points),
+            'num_rows': len(server.metrics_history),
+            'oldest_round': server.metrics_history.oldest_round(),
+            'latest_round': server.metrics_history.latest_round()
+        })
+    
+    since = request.args.get('since', type=int)
+    limit = min(request.args.get('limit', METRICS_PAGE_SIZE, type=int), METRICS_PAGE_SIZE)
+    
+    rows = server.metrics_history.rows(since=since, limit=limit + 1)
     return jsonify({
-        'metrics_history': server.metrics_history
+        'metrics_history': rows[:limit],
+        'has_more': len(rows) > limit,
+        'oldest_round': server.metrics_history.oldest_round(),
+        'latest_round': server.metrics_history.latest_round()
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Per-stage timings and counters in the Prometheus text format"""
+    if not instrumentation.enabled():
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(instrumentation.render(), content_type=instrumentation.CONTENT_TYPE)
+
 @app.route('/start_round', methods=['POST'])
 def start_round():
     """Manually trigger a new training round"""
+    server = get_server()
     if server.is_training:
         return jsonify({'status': 'error', 'message': 'Training already in progress'}), 400
     
     Thread(target=server.start_training_round).start()
     return jsonify({'status': 'success', 'message': 'Started new training round'})
 
-def run_server(host='0.0.0.0', port=5000):
+def run_server(host='0.0.0.0', port=5000, model_backend=None):
     """Run the federated learning server"""
+    server = get_server(model_backend)
     server.load_global_model()
     app.run(host=host, port=port, debug=False)
 
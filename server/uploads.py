@@ -0,0 +1,174 @@
+# server/uploads.py
+import os
+import time
+import uuid
+import zlib
+import hashlib
+import threading
+
+class UploadError(Exception):
+    """Raised when an upload request cannot be applied to its session"""
+
+    def __init__(self, message, status_code=400, offset=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.offset = offset
+
+class UploadManager:
+    """Tracks resumable chunked uploads
+
+    A client initiates an upload with the total size and SHA-256 of the body,
+    then sends fixed-size chunks in order, each with a CRC32 checksum. The
+    chunks are written straight into a preallocated file, so the body is never
+    held in memory; the client can ask for the received byte offset and resume
+    after a dropped connection. Committing verifies the full checksum and
+    hands the file path to the caller.
+
+    Each session's file is preallocated to the full body size, so sessions
+    are bounded: a client has at most max_sessions_per_client (starting a
+    new upload abandons its least recently used one), at most max_sessions
+    are open in total, and sessions untouched for session_ttl seconds are
+    dropped. Part files left over from an earlier server process are
+    removed on startup, since their sessions are gone with it.
+    """
+
+    def __init__(self, upload_dir='./server/uploads', chunk_size=256 * 1024,
+                 max_upload_size=256 * 1024 * 1024, session_ttl=3600,
+                 max_sessions=64, max_sessions_per_client=2):
+        self.upload_dir = upload_dir
+        self.chunk_size = chunk_size
+        self.max_upload_size = max_upload_size
+        self.session_ttl = session_ttl
+        self.max_sessions = max_sessions
+        self.max_sessions_per_client = max_sessions_per_client
+        self.sessions = {}
+        self.lock = threading.Lock()
+        os.makedirs(upload_dir, exist_ok=True)
+        for filename in os.listdir(upload_dir):
+            if filename.endswith('.part'):
+                os.remove(os.path.join(upload_dir, filename))
+
+    def _path(self, upload_id):
+        return os.path.join(self.upload_dir, f"{upload_id}.part")
+
+    def _get(self, upload_id):
+        session = self.sessions.get(upload_id)
+        if session is None:
+            raise UploadError('Unknown upload', status_code=404)
+        return session
+
+    def expire_stale(self):
+        """Drop sessions that have not been touched for session_ttl seconds"""
+        with self.lock:
+            self._expire_stale()
+
+    def _expire_stale(self):
+        now = time.time()
+        stale = [upload_id for upload_id, session in self.sessions.items()
+                 if now - session['updated_at'] > self.session_ttl]
+        for upload_id in stale:
+            self._discard(upload_id)
+
+    def _discard(self, upload_id):
+        self.sessions.pop(upload_id, None)
+        if os.path.exists(self._path(upload_id)):
+            os.remove(self._path(upload_id))
+
+    def initiate(self, client_id, total_size, sha256):
+        """Start an upload session and preallocate its file"""
+        if total_size <= 0 or total_size > self.max_upload_size:
+            raise UploadError(f"Upload size must be between 1 and {self.max_upload_size} bytes")
+
+        upload_id = uuid.uuid4().hex
+        with self.lock:
+            self._expire_stale()
+
+            # A client uploads one update at a time, so its older sessions
+            # are uploads it has given up on
+            client_sessions = sorted(
+                (session['updated_at'], other_id) for other_id, session in self.sessions.items()
+                if session['client_id'] == client_id
+            )
+            for _, other_id in client_sessions[:max(0, len(client_sessions) - self.max_sessions_per_client + 1)]:
+                self._discard(other_id)
+
+            if len(self.sessions) >= self.max_sessions:
+                raise UploadError('Too many uploads in progress, retry later', status_code=503)
+
+            self.sessions[upload_id] = {
+                'client_id': client_id,
+                'total_size': total_size,
+                'sha256': sha256,
+                'offset': 0,
+                'updated_at': time.time()
+            }
+
+        try:
+            with open(self._path(upload_id), 'wb') as file:
+                file.truncate(total_size)
+        except OSError:
+            self.discard(upload_id)
+            raise
+        return self.status(upload_id)
+
+    def status(self, upload_id):
+        """Return the received byte offset of an upload"""
+        session = self._get(upload_id)
+        return {
+            'upload_id': upload_id,
+            'offset': session['offset'],
+            'total_size': session['total_size'],
+            'chunk_size': self.chunk_size
+        }
+
+    def write_chunk(self, upload_id, offset, data, crc32):
+        """Write one chunk at offset after checking its position and checksum"""
+        with self.lock:
+            session = self._get(upload_id)
+
+            # Chunks must arrive in order; a client resuming after a drop
+            # learns the offset to continue from
+            if offset != session['offset']:
+                raise UploadError('Unexpected chunk offset', status_code=409, offset=session['offset'])
+
+            expected_size = min(self.chunk_size, session['total_size'] - offset)
+            if len(data) != expected_size:
+                raise UploadError(f"Chunk must be {expected_size} bytes", offset=session['offset'])
+
+            if format(zlib.crc32(data), '08x') != crc32:
+                raise UploadError('Chunk checksum mismatch', offset=session['offset'])
+
+            with open(self._path(upload_id), 'r+b') as file:
+                file.seek(offset)
+                file.write(data)
+
+            session['offset'] += len(data)
+            session['updated_at'] = time.time()
+            return session['offset']
+
+    def commit(self, upload_id):
+        """Verify a completed upload and return (client_id, path)
+
+        The caller owns the file afterwards and should call discard() once
+        it has consumed it.
+        """
+        with self.lock:
+            session = self._get(upload_id)
+            if session['offset'] != session['total_size']:
+                raise UploadError('Upload incomplete', status_code=409, offset=session['offset'])
+
+            digest = hashlib.sha256()
+            with open(self._path(upload_id), 'rb') as file:
+                for block in iter(lambda: file.read(1024 * 1024), b''):
+                    digest.update(block)
+
+            if digest.hexdigest() != session['sha256']:
+                self._discard(upload_id)
+                raise UploadError('Upload checksum mismatch, restart the upload', status_code=422)
+
+            return session['client_id'], self._path(upload_id)
+
+    def discard(self, upload_id):
+        """Remove an upload session and its file"""
+        with self.lock:
+            self._discard(upload_id)
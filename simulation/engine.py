@@ -0,0 +1,277 @@
+# simulation/engine.py
+import io
+import os
+import time
+import math
+import contextlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from models.simple_classifier import SimpleTextClassifier
+from client.data_processor import TextDataProcessor, label_from_filename
+from server.server import FederatedServer
+from utils.communication import encode_update, decode_update, weights_fingerprint
+
+# Corpora of recently used client directories, per worker process
+_corpus_cache = OrderedDict()
+_CORPUS_CACHE_SIZE = 256
+
+
+class VirtualClient:
+    """A simulated client: just an id and the directory holding its data
+
+    Unlike FederatedClient it has no model, spool, cache or API; a worker
+    process builds a model only for the duration of its local training.
+    """
+
+    __slots__ = ('client_id', 'data_dir')
+
+    def __init__(self, client_id, data_dir):
+        self.client_id = client_id
+        self.data_dir = data_dir
+
+
+def find_client_dirs(data_dir):
+    """Subdirectories of data_dir that hold labeled client data"""
+    client_dirs = []
+    for name in sorted(os.listdir(data_dir)):
+        path = os.path.join(data_dir, name)
+        if os.path.isdir(path) and any(
+            label_from_filename(filename) is not None for filename in os.listdir(path)
+        ):
+            client_dirs.append(path)
+    return client_dirs
+
+
+def load_client_data(data_dir, validation_split=0.2):
+    """(train_texts, train_labels, val_texts, val_labels) of a client directory"""
+    cached = _corpus_cache.get(data_dir)
+    if cached is not None:
+        _corpus_cache.move_to_end(data_dir)
+        return cached
+
+    processor = TextDataProcessor(data_dir)
+    texts, labels, _ = processor._read_labeled_examples()
+    if texts:
+        train_indices, val_indices = processor._split_indices(len(texts), validation_split)
+    else:
+        train_indices, val_indices = [], []
+    data = (
+        [texts[i] for i in train_indices], [labels[i] for i in train_indices],
+        [texts[i] for i in val_indices], [labels[i] for i in val_indices]
+    )
+
+    _corpus_cache[data_dir] = data
+    if len(_corpus_cache) > _CORPUS_CACHE_SIZE:
+        _corpus_cache.popitem(last=False)
+    return data
+
+
+def _init_worker():
+    # One BLAS thread per worker process; the pool provides the parallelism
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(1)
+    except ImportError:
+        pass
+
+
+def train_clients(global_weights, clients, num_classes, wire_dtype='float32', max_iter=20):
+    """Local training of a batch of virtual clients, run in a worker process
+
+    The global weights arrive once per batch rather than once per client.
+    Returns (client_id, encoded update) pairs, in the format real clients
+    upload.
+    """
+    results = []
+    for client_id, data_dir in clients:
+        train_texts, train_labels, val_texts, val_labels = load_client_data(data_dir)
+        if not train_texts:
+            continue
+
+        model = SimpleTextClassifier(num_classes=num_classes, warm_start_max_iter=max_iter)
+        model.set_weights(global_weights)
+
+        started = time.perf_counter()
+        history = model.fit(train_texts, train_labels)
+        seconds = time.perf_counter() - started
+
+        metrics = {'loss': 0.5, 'accuracy': 0.0}
+        if val_texts:
+            loss, accuracy = model.evaluate(val_texts, val_labels)
+            metrics = {'loss': float(loss), 'accuracy': float(accuracy)}
+        work = {'num_examples': len(train_texts), 'epochs': history['epochs'][-1], 'seconds': seconds}
+        results.append((client_id, encode_update(model.get_weights(), {'metrics': metrics, 'work': work}, wire_dtype)))
+    return results
+
+
+class Simulation:
+    """Federated rounds with many virtual clients against a real FederatedServer
+
+    Clients are spread round-robin over the given data directories and
+    trained in batches on a process pool. Their encoded updates are decoded
+    and handed to the server's receive_update and aggregate_models, so the
+    server side runs exactly as in production. Only the sklearn backend is
+    supported; the Keras backends would load TensorFlow in every worker.
+
+    Unlike production, the initial global model is by default fitted on
+    bootstrap_size examples pooled from the clients' data, which makes the
+    reported accuracy optimistic; with bootstrap_size=0 the global model
+    starts unfitted and the first round's updates set its layout, as on a
+    freshly started server.
+    """
+
+    def __init__(self, client_dirs, num_clients, workers=None, participation=1.0, wire_dtype='float32',
+                 local_max_iter=20, bootstrap_size=2000, eval_clients=50, work_dir='./simulation_run', seed=0):
+        if not client_dirs:
+            raise ValueError('No client data directories to simulate with')
+
+        self.clients = [
+            VirtualClient(f"sim{i:05d}", client_dirs[i % len(client_dirs)])
+            for i in range(num_clients)
+        ]
+        self.workers = workers or os.cpu_count() or 1
+        self.participation = participation
+        self.wire_dtype = wire_dtype
+        self.local_max_iter = local_max_iter
+        self.rng = np.random.default_rng(seed)
+
+        self.server = FederatedServer(model_path=os.path.join(work_dir, 'global_model'), model_backend='sklearn')
+        self.num_classes = self.server.global_model.num_classes
+
+        # Held-out evaluation set pooled from the validation splits of up to
+        # eval_clients data directories
+        self.eval_texts, self.eval_labels = [], []
+        for data_dir in client_dirs[:eval_clients]:
+            _, _, val_texts, val_labels = load_client_data(data_dir)
+            self.eval_texts.extend(val_texts)
+            self.eval_labels.extend(val_labels)
+
+        self.bootstrap_examples = self._bootstrap(client_dirs, bootstrap_size) if bootstrap_size > 0 else 0
+
+    def _bootstrap(self, client_dirs, bootstrap_size):
+        """Fit the initial global model on a small pooled sample; returns its size
+
+        Gives every client the same vocabulary and full set of class rows
+        from the first round, like a seed model shipped with a deployment,
+        but trained on the clients' own data, which no real server sees.
+        """
+        texts, labels = [], []
+        for data_dir in client_dirs:
+            train_texts, train_labels, _, _ = load_client_data(data_dir)
+            texts.extend(train_texts)
+            labels.extend(train_labels)
+            if len(texts) >= bootstrap_size:
+                break
+        if texts:
+            self.server.global_model.fit(texts[:bootstrap_size], labels[:bootstrap_size])
+            self.server.model_hash = weights_fingerprint(self.server.global_model.get_weights())
+        return min(len(texts), bootstrap_size)
+
+    def evaluate(self):
+        """Accuracy of the global model on the held-out set"""
+        if not self.eval_texts:
+            return None
+        return float(self.server.global_model.evaluate(self.eval_texts, self.eval_labels)[1])
+
+    def run_round(self, pool):
+        """Run one round and return its measurements"""
+        started = time.perf_counter()
+        round_number = self.server.round_number
+
+        participants = self.clients
+        if self.participation < 1.0:
+            count = max(1, int(round(len(self.clients) * self.participation)))
+            chosen = self.rng.choice(len(self.clients), count, replace=False)
+            participants = [self.clients[i] for i in sorted(chosen)]
+
+        global_weights = self.server.global_model.get_weights()
+        bytes_down = len(encode_update(global_weights, wire_dtype=self.wire_dtype)) * len(participants)
+
+        # A few batches per worker balances load without shipping the
+        # global weights once per client
+        batch_size = max(1, math.ceil(len(participants) / (self.workers * 4)))
+        batches = [
+            [(client.client_id, client.data_dir) for client in participants[i:i + batch_size]]
+            for i in range(0, len(participants), batch_size)
+        ]
+        futures = [
+            pool.submit(train_clients, global_weights, batch, self.num_classes, self.wire_dtype, self.local_max_iter)
+            for batch in batches
+        ]
+
+        bytes_up = 0
+        updates = 0
+        decode_seconds = 0.0
+        for future in futures:
+            for client_id, blob in future.result():
+                bytes_up += len(blob)
+                decode_started = time.perf_counter()
+                weights, metadata = decode_update(blob)
+                decode_seconds += time.perf_counter() - decode_started
+                with contextlib.redirect_stdout(io.StringIO()):
+                    self.server.receive_update(client_id, weights, metadata.get('metrics', {}), metadata.get('work'))
+                updates += 1
+        train_seconds = time.perf_counter() - started
+
+        aggregate_started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            averaged = self.server.aggregate_models()
+        aggregate_seconds = time.perf_counter() - aggregate_started
+
+        # The server only records a round it has aggregated updates for
+        client_metrics = {}
+        for row in self.server.metrics_history.rows(since=round_number - 1):
+            if row['round'] == round_number:
+                client_metrics = row['metrics']
+        return {
+            'round': round_number,
+            'num_clients': len(self.clients),
+            'participants': len(participants),
+            'updates_received': updates,
+            'updates_averaged': averaged,
+            'round_seconds': time.perf_counter() - started,
+            'train_seconds': train_seconds,
+            'decode_seconds': decode_seconds,
+            'aggregate_seconds': aggregate_seconds,
+            'bytes_down': bytes_down,
+            'bytes_up': bytes_up,
+            'client_accuracy': client_metrics.get('accuracy'),
+            'global_accuracy': self.evaluate()
+        }
+
+    def run(self, rounds):
+        """Run rounds and return the per-round measurements"""
+        results = []
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker) as pool:
+            for _ in range(rounds):
+                results.append(self.run_round(pool))
+        return results
+
+
+def summarize(results, num_clients=None, bootstrap_examples=0):
+    """Per-client-count averages of the round measurements
+
+    bootstrap_examples is the size of the pooled sample the initial global
+    model was fitted on (Simulation.bootstrap_examples), reported so
+    accuracies are not mistaken for those of a production start. Without
+    any rounds the averages are None.
+    """
+    rows = list(results)
+    summary = {
+        'num_clients': rows[0]['num_clients'] if rows else num_clients,
+        'rounds': len(rows),
+        'bootstrap_examples': bootstrap_examples
+    }
+    if not rows:
+        return dict(summary, mean_round_seconds=None, mean_aggregate_seconds=None, bytes_down_per_round=None,
+                    bytes_up_per_round=None, final_global_accuracy=None, final_updates_averaged=None)
+    return {
+        **summary,
+        'mean_round_seconds': float(np.mean([r['round_seconds'] for r in rows])),
+        'mean_aggregate_seconds': float(np.mean([r['aggregate_seconds'] for r in rows])),
+        'bytes_down_per_round': float(np.mean([r['bytes_down'] for r in rows])),
+        'bytes_up_per_round': float(np.mean([r['bytes_up'] for r in rows])),
+        'final_global_accuracy': rows[-1]['global_accuracy'],
+        'final_updates_averaged': rows[-1]['updates_averaged']
+    }
@@ -0,0 +1,208 @@
+# simulation/synthetic_data.py
+"""Synthetic non-IID text data for simulations and load tests
+
+Writes labeled examples for many clients in the corpus format clients read
+(class_id_*.txt files of examples separated by blank lines, plus
+class_names.json). Each client gets its own directory and generator seed, so
+clients are generated independently on a process pool and the output is the
+same for the same seed whatever the number of workers. Examples are written
+in fixed-size batches, so memory does not grow with the number of examples.
+
+Distribution controls:
+- alpha: Dirichlet concentration of each client's label distribution; small
+  values give clients dominated by a few classes, large values near-uniform
+  labels.
+- quantity_sigma: log-normal spread of the number of examples per client;
+  0 gives every client the same amount of data.
+- vocab_overlap: probability that a background word comes from the
+  vocabulary all clients share rather than from the client's own; lower
+  values make client vocabularies more disjoint.
+
+Usage:
+    python -m simulation.synthetic_data --output-dir data/synthetic --num-clients 1000 --total-examples 1000000
+"""
+import os
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+
+CLASS_NAMES = ['Negative', 'Somewhat Negative', 'Neutral', 'Somewhat Positive', 'Positive']
+
+# Pseudo-words are built from these, so vocabularies of any size can be
+# generated without shipping a word list
+SYLLABLES = [
+    'ba', 'be', 'bi', 'bo', 'bu', 'da', 'de', 'di', 'do', 'du', 'ka', 'ke', 'ki', 'ko', 'ku',
+    'la', 'le', 'li', 'lo', 'lu', 'ma', 'me', 'mi', 'mo', 'mu', 'na', 'ne', 'ni', 'no', 'nu',
+    'ra', 're', 'ri', 'ro', 'ru', 'sa', 'se', 'si', 'so', 'su', 'ta', 'te', 'ti', 'to', 'tu'
+]
+
+
+def make_words(count, prefix=''):
+    """count distinct pseudo-words, optionally prefixed"""
+    words = []
+    base = len(SYLLABLES)
+    for i in range(count):
+        syllables = []
+        n = i + base
+        while n:
+            n, digit = divmod(n, base)
+            syllables.append(SYLLABLES[digit])
+        words.append(prefix + ''.join(syllables))
+    return words
+
+
+def client_sizes(num_clients, total_examples, quantity_sigma, rng):
+    """Examples per client: log-normal shares of total_examples, at least 1 each"""
+    if quantity_sigma > 0:
+        shares = rng.lognormal(0.0, quantity_sigma, num_clients)
+    else:
+        shares = np.ones(num_clients)
+    sizes = np.maximum(1, np.floor(shares / shares.sum() * total_examples).astype(np.int64))
+    return sizes
+
+
+def generate_client(client_dir, num_examples, seed, num_classes=5, alpha=0.5, vocab_overlap=0.5,
+                    shared_vocab_size=5000, client_vocab_size=500, class_vocab_size=50,
+                    signal_ratio=0.3, mean_length=12, examples_per_file=1000, batch_size=1000):
+    """Write one client's examples and return its per-class counts
+
+    Each example mixes words indicative of its class (signal_ratio of them)
+    with background words from the shared or the client's own vocabulary.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(client_dir, exist_ok=True)
+    with open(os.path.join(client_dir, 'class_names.json'), 'w') as file:
+        json.dump(CLASS_NAMES[:num_classes] if num_classes <= len(CLASS_NAMES)
+                  else [f"Class {i}" for i in range(num_classes)], file)
+
+    # Class and shared vocabularies are the same for every client; the
+    # client's own words are prefixed with its full seed so they never
+    # collide with another client's
+    class_words = [np.array(make_words(class_vocab_size, f"c{c}")) for c in range(num_classes)]
+    shared_words = np.array(make_words(shared_vocab_size))
+    own_words = np.array(make_words(client_vocab_size, f"u{seed}"))
+
+    label_probs = rng.dirichlet(np.full(num_classes, alpha))
+    counts = np.zeros(num_classes, dtype=np.int64)
+    files = {}
+
+    try:
+        remaining = num_examples
+        while remaining > 0:
+            batch = min(batch_size, remaining)
+            remaining -= batch
+
+            labels = rng.choice(num_classes, batch, p=label_probs)
+            lengths = rng.poisson(mean_length, batch) + 3
+            total = int(lengths.sum())
+            # Draw all words of the batch at once, then cut them into examples
+            is_signal = rng.random(total) < signal_ratio
+            from_shared = rng.random(total) < vocab_overlap
+            word_labels = np.repeat(labels, lengths)
+            words = np.where(
+                from_shared,
+                shared_words[rng.integers(0, len(shared_words), total)],
+                own_words[rng.integers(0, len(own_words), total)]
+            )
+            signal_positions = np.flatnonzero(is_signal)
+            for c in range(num_classes):
+                positions = signal_positions[word_labels[signal_positions] == c]
+                words[positions] = class_words[c][rng.integers(0, class_vocab_size, len(positions))]
+
+            offsets = np.concatenate(([0], np.cumsum(lengths)))
+            for i, label in enumerate(labels):
+                label = int(label)
+                count = counts[label]
+                if count % examples_per_file == 0:
+                    if label in files:
+                        files[label].close()
+                    filename = f"{label}_synthetic_{count // examples_per_file}.txt"
+                    files[label] = open(os.path.join(client_dir, filename), 'w', encoding='utf-8')
+                else:
+                    files[label].write('\n\n')
+                files[label].write(' '.join(words[offsets[i]:offsets[i + 1]]))
+                counts[label] += 1
+    finally:
+        for file in files.values():
+            file.close()
+
+    return counts.tolist()
+
+
+def _generate_client(kwargs):
+    return generate_client(**kwargs)
+
+
+def generate(output_dir, num_clients, total_examples, workers=None, seed=0, quantity_sigma=1.0, **client_options):
+    """Generate data for num_clients clients under output_dir
+
+    client_options are passed on to generate_client. At most two clients
+    per worker are queued at a time. Returns per-client summaries, which are
+    also saved to output_dir/manifest.json.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    seeds = np.random.SeedSequence(seed)
+    sizes = client_sizes(num_clients, total_examples, quantity_sigma, np.random.default_rng(seeds.spawn(1)[0]))
+    client_seeds = seeds.generate_state(num_clients)
+    workers = workers or os.cpu_count() or 1
+
+    jobs = (
+        {
+            'client_dir': os.path.join(output_dir, f"client{i:05d}"),
+            'num_examples': int(sizes[i]),
+            'seed': int(client_seeds[i]),
+            **client_options
+        }
+        for i in range(num_clients)
+    )
+
+    manifest = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        for job in jobs:
+            if len(pending) >= workers * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    manifest.append(dict(pending.pop(future), class_counts=future.result()))
+            pending[pool.submit(_generate_client, job)] = {
+                'client_dir': job['client_dir'], 'num_examples': job['num_examples']
+            }
+        for future, summary in pending.items():
+            manifest.append(dict(summary, class_counts=future.result()))
+
+    manifest.sort(key=lambda summary: summary['client_dir'])
+    with open(os.path.join(output_dir, 'manifest.json'), 'w') as file:
+        json.dump({'seed': seed, 'num_clients': num_clients, 'clients': manifest}, file)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic non-IID client data')
+    parser.add_argument('--output-dir', required=True, help='Directory to create the client directories in')
+    parser.add_argument('--num-clients', type=int, default=100, help='Number of clients')
+    parser.add_argument('--total-examples', type=int, default=100000, help='Examples over all clients')
+    parser.add_argument('--alpha', type=float, default=0.5, help='Dirichlet concentration of label skew')
+    parser.add_argument('--quantity-sigma', type=float, default=1.0, help='Log-normal spread of client sizes')
+    parser.add_argument('--vocab-overlap', type=float, default=0.5,
+                        help='Share of background words from the common vocabulary (0-1)')
+    parser.add_argument('--num-classes', type=int, default=5, help='Number of classes')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    args = parser.parse_args()
+
+    manifest = generate(
+        args.output_dir, args.num_clients, args.total_examples,
+        workers=args.workers,
+        seed=args.seed,
+        quantity_sigma=args.quantity_sigma,
+        alpha=args.alpha,
+        vocab_overlap=args.vocab_overlap,
+        num_classes=args.num_classes
+    )
+    total = sum(summary['num_examples'] for summary in manifest)
+    print(f"Wrote {total} examples for {len(manifest)} clients to {args.output_dir}")
+
+
+if __name__ == '__main__':
+    main()
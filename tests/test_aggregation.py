@@ -0,0 +1,37 @@
+# tests/test_aggregation.py
+import numpy as np
+from server.aggregation import federated_average
+
+
+def update(coef_value, vocabulary=('good', 'bad')):
+    vocab = np.array([(word, i) for i, word in enumerate(vocabulary)], dtype=object)
+    return [np.full((2, len(vocabulary)), coef_value, dtype=np.float32), np.zeros(2, dtype=np.float32), vocab]
+
+
+def test_weighted_average():
+    average, count = federated_average([update(1.0), update(4.0)], sample_weights=[2, 1])
+    assert count == 2
+    assert average[0].dtype == np.float32
+    assert np.allclose(average[0], 2.0)
+
+
+def test_reference_layout_comes_from_global_model():
+    global_weights = update(0.0)
+    private = update(9.0, vocabulary=('hello', 'world'))
+    average, count = federated_average([private, update(1.0), update(3.0)], reference=global_weights)
+
+    assert count == 2
+    assert np.allclose(average[0], 2.0)
+    # The global vocabulary is kept, not replaced by the first update's
+    assert [tuple(row) for row in average[2]] == [('good', 0), ('bad', 1)]
+
+
+def test_without_reference_first_update_sets_layout():
+    private = update(9.0, vocabulary=('hello', 'world'))
+    average, count = federated_average([private, update(1.0)])
+    assert count == 1
+    assert np.allclose(average[0], 9.0)
+
+
+def test_no_matching_update():
+    assert federated_average([update(1.0, vocabulary=('x', 'y'))], reference=update(0.0)) == (None, 0)
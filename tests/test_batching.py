@@ -0,0 +1,39 @@
+# tests/test_batching.py
+import threading
+from client.batching import MicroBatcher
+
+
+def classify(items):
+    return [item.upper() for item in items]
+
+
+def submit_concurrently(batcher, items):
+    results = [None] * len(items)
+
+    def submit(i):
+        try:
+            results[i] = batcher.submit(items[i], timeout=5)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(items))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_results_go_to_their_callers():
+    batcher = MicroBatcher(classify, max_batch_size=8, max_wait_ms=50)
+    items = [f"text {i}" for i in range(6)]
+    assert submit_concurrently(batcher, items) == [item.upper() for item in items]
+
+
+def test_bad_item_only_fails_its_own_request():
+    batcher = MicroBatcher(classify, max_batch_size=8, max_wait_ms=50)
+    items = ['a', 'b', 123, 'c', 'd', 'e']
+    results = submit_concurrently(batcher, items)
+
+    assert isinstance(results[2], AttributeError)
+    assert [r for i, r in enumerate(results) if i != 2] == ['A', 'B', 'C', 'D', 'E']
@@ -0,0 +1,67 @@
+# tests/test_circuit_breaker.py
+import pytest
+import requests
+from utils.communication import HttpTransport, CircuitOpenError
+
+
+class FakeResponse:
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+
+
+def make_transport(monkeypatch, outcomes):
+    """Transport whose session returns or raises the given outcomes in turn"""
+    transport = HttpTransport('http://server.invalid', max_attempts=1, failure_threshold=1, reset_timeout=0.0)
+    outcomes = list(outcomes)
+
+    def fake_request(method, url, **kwargs):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(transport.session, 'request', fake_request)
+    return transport
+
+
+def test_circuit_opens_after_failures(monkeypatch):
+    transport = make_transport(monkeypatch, [requests.exceptions.ConnectionError()])
+    transport.breaker.reset_timeout = 60.0
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        transport.get('/get_status')
+    assert transport.breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        transport.get('/get_status')
+
+
+@pytest.mark.parametrize('error', [
+    requests.exceptions.ChunkedEncodingError(),
+    requests.exceptions.TooManyRedirects(),
+    requests.exceptions.InvalidURL(),
+])
+def test_half_open_trial_ends_on_other_request_errors(monkeypatch, error):
+    transport = make_transport(monkeypatch, [requests.exceptions.ConnectionError(), error, FakeResponse(200)])
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        transport.get('/get_status')
+    assert transport.breaker.state == 'half-open'
+
+    # The trial call fails with an error that is not retried...
+    with pytest.raises(type(error)):
+        transport.get('/get_status')
+    assert not transport.breaker.trial_in_flight
+
+    # ...and the next trial is still let through and closes the circuit
+    assert transport.get('/get_status').status_code == 200
+    assert transport.breaker.state == 'closed'
+
+
+def test_half_open_trial_failure_reopens(monkeypatch):
+    transport = make_transport(monkeypatch, [requests.exceptions.ConnectionError(), FakeResponse(503)])
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        transport.get('/get_status')
+    assert transport.get('/get_status', retry=False).status_code == 503
+    assert transport.breaker.opened_at is not None
+    assert not transport.breaker.trial_in_flight
@@ -0,0 +1,28 @@
+# tests/test_client_metrics.py
+import pytest
+from client.client import FederatedClient
+from simulation.synthetic_data import generate_client
+
+
+def trained_metrics(tmp_path, backend):
+    generate_client(str(tmp_path / 'data'), 200, seed=2)
+    client = FederatedClient('http://127.0.0.1:9', str(tmp_path / 'data'), client_id='c1',
+                             spool_dir=str(tmp_path / 'spool'), model_backend=backend)
+    if backend != 'sklearn':
+        client.local_epochs = 1
+    metrics = client.train_local_model()
+    return client, metrics
+
+
+def test_sklearn_metrics_are_validation_metrics(tmp_path):
+    client, metrics = trained_metrics(tmp_path, 'sklearn')
+    assert set(metrics) == {'loss', 'accuracy'}
+    assert metrics['accuracy'] == client._evaluate(client.local_model)['accuracy']
+
+
+def test_keras_metrics_are_validation_metrics(tmp_path):
+    pytest.importorskip('tensorflow')
+    client, metrics = trained_metrics(tmp_path, 'keras_tiny')
+    # Keras 3 lists the compiled metrics as 'compile_metrics' in metrics_names
+    assert set(metrics) == {'loss', 'accuracy'}
+    assert metrics['accuracy'] == pytest.approx(client._evaluate(client.local_model)['accuracy'])
@@ -0,0 +1,30 @@
+# tests/test_data_processor.py
+from client.client import FederatedClient
+from client.data_processor import TextDataProcessor
+
+
+def write_examples(data_dir):
+    data_dir.mkdir()
+    (data_dir / '0_reviews.txt').write_text("I don't like it!\n\nDon't buy this.\n\nWorst, awful.", encoding='utf-8')
+    (data_dir / '4_reviews.txt').write_text("Great product.\n\nI love it!\n\nExcellent, great.", encoding='utf-8')
+
+
+def test_examples_are_cleaned_like_inference_texts(tmp_path):
+    write_examples(tmp_path / 'data')
+    processor = TextDataProcessor(str(tmp_path / 'data'))
+    texts, _, _ = processor._read_labeled_examples()
+    assert "i dont like it" in texts
+    assert texts == processor.clean_texts(texts)
+
+
+def test_training_and_inference_share_tokens(tmp_path):
+    write_examples(tmp_path / 'data')
+    client = FederatedClient('http://127.0.0.1:9', str(tmp_path / 'data'), client_id='c1',
+                             spool_dir=str(tmp_path / 'spool'), model_backend='sklearn')
+    client.train_local_model()
+
+    vocabulary = client.local_model.vectorizer.vocabulary_
+    assert 'dont' in vocabulary and 'don' not in vocabulary
+    # The cleaned query maps onto the trained token
+    rows, cols = client._snapshot.compiled.token_indices(client.data_processor.clean_texts(["Don't"]))
+    assert list(cols) == [vocabulary['dont']]
@@ -0,0 +1,57 @@
+# tests/test_numpy_inference.py
+import numpy as np
+import pytest
+from models.simple_classifier import SimpleTextClassifier
+from models.numpy_inference import CompiledTextClassifier
+
+TEXTS = ['terrible awful film', 'bad poor acting', 'okay average plot', 'good nice cast', 'great excellent movie'] * 4
+LABELS = [0, 1, 2, 3, 4] * 4
+
+QUERIES = [
+    'great movie',
+    'Terrible, AWFUL acting!',
+    # Out of vocabulary, partly and entirely
+    'great zyzzyva',
+    'qwerty asdfgh',
+    # No tokens at all
+    '',
+    'a',
+    '   '
+]
+
+
+def fitted(num_classes=5, texts=TEXTS, labels=LABELS):
+    model = SimpleTextClassifier(num_classes=num_classes)
+    model.fit(texts, labels)
+    return model
+
+
+@pytest.mark.parametrize('queries', [QUERIES, ['great zyzzyva'], ['']])
+def test_matches_sklearn(queries):
+    model = fitted()
+    compiled = CompiledTextClassifier.from_classifier(model)
+
+    expected = model.predict(queries)
+    probs = compiled.predict(queries)
+    assert probs.shape == expected.shape
+    assert np.allclose(probs, expected, atol=1e-5)
+    assert np.array_equal(probs.argmax(axis=1), expected.argmax(axis=1))
+
+
+def test_texts_without_known_tokens_get_intercept_probabilities():
+    model = fitted()
+    compiled = CompiledTextClassifier.from_classifier(model)
+    probs = compiled.predict(['', 'qwerty asdfgh'])
+    assert np.allclose(probs[0], probs[1])
+    assert np.allclose(probs[0], model.predict([''])[0], atol=1e-5)
+
+
+def test_binary_model():
+    texts = ['good great', 'bad awful'] * 5
+    model = fitted(num_classes=2, texts=texts, labels=[1, 0] * 5)
+    compiled = CompiledTextClassifier.from_classifier(model)
+    assert np.allclose(compiled.predict(QUERIES), model.predict(QUERIES), atol=1e-5)
+
+
+def test_unfitted_model_is_not_compiled():
+    assert CompiledTextClassifier.from_classifier(SimpleTextClassifier()) is None
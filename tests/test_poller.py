@@ -0,0 +1,31 @@
+# tests/test_poller.py
+import json
+from dashboard.poller import SnapshotPoller
+
+
+class OfflineTransport:
+    def get(self, path, **kwargs):
+        raise ConnectionError('offline')
+
+
+def drain(subscriber):
+    events = []
+    while not subscriber.empty():
+        event, data = subscriber.get_nowait()
+        events.append((event, json.loads(data)))
+    return events
+
+
+def test_full_queue_keeps_latest_metrics():
+    poller = SnapshotPoller(OfflineTransport(), status_interval=3600, max_queued_events=3)
+    poller.stop()
+    poller.worker.join()
+    subscriber = poller.subscribe()
+
+    poller._publish('metrics', {'round': 1})
+    for n in range(10):
+        poller._publish('status', {'round': 1, 'n': n})
+
+    events = dict(drain(subscriber))
+    assert events['metrics'] == {'round': 1}
+    assert events['status'] == {'round': 1, 'n': 9}
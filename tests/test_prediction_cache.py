@@ -0,0 +1,34 @@
+# tests/test_prediction_cache.py
+import numpy as np
+from client.client import FederatedClient
+from simulation.synthetic_data import generate_client
+
+
+def trained_client(tmp_path):
+    generate_client(str(tmp_path / 'data'), 200, seed=5)
+    client = FederatedClient('http://127.0.0.1:9', str(tmp_path / 'data'), client_id='c1',
+                             spool_dir=str(tmp_path / 'spool'), model_backend='sklearn')
+    client.train_local_model()
+    return client
+
+
+def test_cache_hit_for_same_model_and_engine(tmp_path):
+    client = trained_client(tmp_path)
+    client.classify_batch(['ba be bi', 'c0baba'])
+    client.classify_batch(['ba be bi', 'c0baba'])
+    assert client.prediction_cache.stats()['hits'] == 2
+
+
+def test_engine_change_is_a_cache_miss(tmp_path):
+    client = trained_client(tmp_path)
+    texts = ['ba be bi', 'c0baba']
+    assert client.inference_engine == 'numpy'
+    client.classify_batch(texts)
+
+    client.inference_engine = 'sklearn'
+    _, probabilities = client.classify_batch(texts)
+    stats = client.prediction_cache.stats()
+    assert stats['hits'] == 0 and stats['invalidations'] == 2
+
+    processed = client.data_processor.clean_texts(texts)
+    assert np.array_equal(probabilities, client.local_model.predict(processed))
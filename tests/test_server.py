@@ -0,0 +1,85 @@
+# tests/test_server.py
+import numpy as np
+import pytest
+from client.client import FederatedClient
+from client.transport import InProcessTransport
+from server import server as server_module
+from server.server import FederatedServer, get_server
+from simulation.synthetic_data import generate_client
+
+
+def test_get_server_keeps_existing_instance(tmp_path, monkeypatch):
+    existing = FederatedServer(model_path=str(tmp_path / 'global_model'), model_backend='sklearn')
+    existing.round_number = 4
+    monkeypatch.setattr(server_module, '_server', existing)
+
+    assert get_server() is existing
+    assert get_server('sklearn') is existing
+    with pytest.raises(ValueError):
+        get_server('keras')
+    assert get_server() is existing and existing.round_number == 4
+
+
+def test_metrics_averaged_over_updates_reporting_them(tmp_path):
+    server = FederatedServer(model_path=str(tmp_path / 'global_model'), model_backend='sklearn')
+    weights = [np.zeros(1, dtype=np.float32)]
+    server.receive_update('c1', weights, {'loss': 1.0, 'accuracy': 0.5})
+    server.receive_update('c2', weights, {'accuracy': 0.7})
+    server.receive_update('c3', weights, {})
+
+    server.aggregate_models()
+    assert server.round_number == 1
+    metrics = server.metrics_history.rows()[-1]['metrics']
+    assert metrics['loss'] == 1.0 and abs(metrics['accuracy'] - 0.6) < 1e-9
+
+
+def test_failed_round_does_not_leave_training_flag_set(tmp_path, monkeypatch):
+    server = FederatedServer(model_path=str(tmp_path / 'global_model'), model_backend='sklearn')
+    monkeypatch.setattr(server_module.time, 'sleep', lambda seconds: None)
+
+    def fail():
+        raise RuntimeError('aggregation failed')
+    monkeypatch.setattr(server, 'aggregate_models', fail)
+
+    with pytest.raises(RuntimeError):
+        server.start_training_round()
+    assert not server.is_training
+
+
+def test_client_without_training_does_not_submit(tmp_path):
+    server = FederatedServer(model_path=str(tmp_path / 'global_model'), model_backend='sklearn')
+    clients = []
+    for name, examples in (('a', 200), ('b', 200), ('empty', 0)):
+        data_dir = str(tmp_path / name)
+        if examples:
+            generate_client(data_dir, examples, seed=len(clients))
+        clients.append(FederatedClient('http://127.0.0.1:9', data_dir, client_id=name,
+                                       spool_dir=str(tmp_path / 'spool' / name), model_backend='sklearn',
+                                       transport=InProcessTransport(server)))
+
+    for _ in range(2):
+        for client in clients:
+            client.run_training_cycle()
+        assert 'empty' not in server.client_updates
+        server.aggregate_models()
+    assert server.round_number == 2
+
+
+def test_incremental_client_without_new_data_sends_heartbeat(tmp_path):
+    server = FederatedServer(model_path=str(tmp_path / 'global_model'), model_backend='sklearn')
+    generate_client(str(tmp_path / 'data'), 200, seed=1)
+    client = FederatedClient('http://127.0.0.1:9', str(tmp_path / 'data'), client_id='c1',
+                             spool_dir=str(tmp_path / 'spool'), model_backend='sklearn',
+                             transport=InProcessTransport(server))
+    client.incremental_training = True
+
+    client.get_global_model()
+    client.submit_model_update()
+    work = server.client_updates['c1']['work']
+    assert work is not None
+
+    # Nothing new: the update from this round stands, nothing is uploaded
+    client.get_global_model()
+    assert client.submit_model_update()['status'] == 'success'
+    assert server.client_updates['c1']['work'] is work
+    assert client.transport.updates_submitted == 1
@@ -0,0 +1,56 @@
+# tests/test_simple_classifier.py
+import numpy as np
+from models.simple_classifier import SimpleTextClassifier
+from server.aggregation import federated_average
+
+TEXTS = ['terrible awful', 'bad poor', 'okay average', 'good nice', 'great excellent'] * 4
+LABELS = [0, 1, 2, 3, 4] * 4
+
+
+def global_model():
+    model = SimpleTextClassifier()
+    model.fit(TEXTS, LABELS)
+    return model
+
+
+def test_missing_classes_keep_all_coefficient_rows():
+    model = global_model()
+    local = SimpleTextClassifier()
+    local.set_weights(model.get_weights())
+
+    # Only two of the five classes are present locally
+    local.fit(['great excellent', 'good great', 'terrible bad'], [4, 4, 0])
+    coef, intercept, _ = local.get_weights()
+    assert coef.shape == (5, len(local.vectorizer.vocabulary_))
+    assert intercept.shape == (5,)
+    assert local.predict(['great']).shape == (1, 5)
+
+
+def test_single_class_client():
+    local = SimpleTextClassifier()
+    local.set_weights(global_model().get_weights())
+    local.fit(['great excellent', 'good great'], [4, 4])
+    assert local.get_weights()[0].shape[0] == 5
+
+
+def test_label_skewed_updates_are_averaged():
+    reference = global_model().get_weights()
+    updates = []
+    for texts, labels in ((['great excellent', 'good'], [4, 3]), (['terrible', 'bad poor', 'okay'], [0, 1, 2])):
+        local = SimpleTextClassifier()
+        local.set_weights(reference)
+        local.fit(texts, labels)
+        updates.append(local.get_weights())
+
+    _, count = federated_average(updates, reference=reference)
+    assert count == 2
+
+
+def test_padding_barely_moves_present_classes():
+    # The stand-in examples of absent classes carry almost no weight
+    texts, labels = ['great excellent', 'good nice', 'terrible awful'] * 3, [4, 3, 0] * 3
+    padded = SimpleTextClassifier()
+    padded.fit(texts, labels)
+    probs = padded.predict(['great excellent', 'terrible'])
+    assert np.argmax(probs[0]) == 4
+    assert np.argmax(probs[1]) == 0
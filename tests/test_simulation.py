@@ -0,0 +1,37 @@
+# tests/test_simulation.py
+from simulation.engine import Simulation, find_client_dirs, summarize
+from simulation.synthetic_data import generate
+
+
+def simulation(tmp_path, **options):
+    generate(str(tmp_path / 'data'), 4, 800, workers=1, quantity_sigma=0.0)
+    client_dirs = find_client_dirs(str(tmp_path / 'data'))
+    return Simulation(client_dirs, 4, workers=1, work_dir=str(tmp_path / 'run'), **options)
+
+
+def test_summarize_without_rounds():
+    summary = summarize([], num_clients=10)
+    assert summary['num_clients'] == 10 and summary['rounds'] == 0
+    assert summary['final_global_accuracy'] is None
+
+
+def test_rounds_report_their_own_metrics(tmp_path):
+    sim = simulation(tmp_path, bootstrap_size=500)
+    results = sim.run(2)
+
+    assert [result['round'] for result in results] == [0, 1]
+    rows = sim.server.metrics_history.rows()
+    for result, row in zip(results, rows):
+        assert result['client_accuracy'] == row['metrics']['accuracy']
+    summary = summarize(results, 4, sim.bootstrap_examples)
+    assert summary['rounds'] == 2 and summary['bootstrap_examples'] == 500
+
+
+def test_production_like_start(tmp_path):
+    sim = simulation(tmp_path, bootstrap_size=0)
+    assert sim.bootstrap_examples == 0
+    assert not sim.server.global_model.is_fitted
+
+    result = sim.run(1)[0]
+    assert result['updates_averaged'] >= 1
+    assert sim.server.global_model.is_fitted
@@ -0,0 +1,33 @@
+# tests/test_synthetic_data.py
+from client.data_processor import TextDataProcessor, label_from_filename
+from simulation.synthetic_data import generate_client
+
+
+def test_label_from_filename():
+    assert label_from_filename('3_reviews.txt') == 3
+    assert label_from_filename('12_synthetic_0.txt') == 12
+    assert label_from_filename('notes.txt') is None
+    assert label_from_filename('3_reviews.json') is None
+
+
+def test_labels_of_more_than_ten_classes(tmp_path):
+    counts = generate_client(str(tmp_path), 600, seed=3, num_classes=12, alpha=100.0)
+    _, labels, _ = TextDataProcessor(str(tmp_path))._read_labeled_examples()
+
+    assert len(labels) == 600
+    assert [labels.count(c) for c in range(12)] == counts
+
+
+def own_words(client_dir):
+    texts, _, _ = TextDataProcessor(client_dir)._read_labeled_examples()
+    return {word for text in texts for word in text.split() if word.startswith('u')}
+
+
+def test_private_vocabularies_do_not_collide(tmp_path):
+    # Seeds that agree in their last five digits
+    generate_client(str(tmp_path / 'a'), 200, seed=7, vocab_overlap=0.0)
+    generate_client(str(tmp_path / 'b'), 200, seed=100007, vocab_overlap=0.0)
+
+    words_a, words_b = own_words(str(tmp_path / 'a')), own_words(str(tmp_path / 'b'))
+    assert words_a and words_b
+    assert not words_a & words_b
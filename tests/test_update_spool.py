@@ -0,0 +1,81 @@
+# tests/test_update_spool.py
+import numpy as np
+import pytest
+from client.client import FederatedClient
+from client.update_spool import UpdateSpool
+from server.server import FederatedServer
+from simulation.engine import load_client_data
+from simulation.synthetic_data import generate_client
+from utils.communication import weights_delta, apply_weights_delta, decode_update
+
+
+def fitted_server(tmp_path):
+    data_dir = tmp_path / 'data'
+    generate_client(str(data_dir), 200, seed=1)
+    server = FederatedServer(model_path=str(tmp_path / 'global_model'), model_backend='sklearn')
+    texts, labels, _, _ = load_client_data(str(data_dir))
+    server.global_model.fit(texts, labels)
+    return server, str(data_dir)
+
+
+def test_delta_round_trip():
+    base = [np.ones((2, 3), dtype=np.float32), np.array(['a', 'b'], dtype=object)]
+    local = [np.full((2, 3), 1.5, dtype=np.float32), base[1]]
+    delta = weights_delta(local, base)
+    assert np.allclose(delta[0], 0.5)
+    assert np.allclose(apply_weights_delta(delta, base)[0], 1.5)
+
+    with pytest.raises(ValueError):
+        weights_delta([np.ones((3, 3)), base[1]], base)
+
+
+def test_server_applies_delta_to_current_global(tmp_path):
+    server, _ = fitted_server(tmp_path)
+    current = server.global_model.get_weights()
+    delta = [np.full_like(w, 0.25) if np.issubdtype(w.dtype, np.number) else w for w in current]
+
+    server.receive_update('c1', delta, {}, delta=True)
+    stored = server.client_updates['c1']['weights']
+    assert np.allclose(stored[0], current[0] + 0.25)
+
+
+def test_server_rejects_delta_of_other_layout(tmp_path):
+    server, _ = fitted_server(tmp_path)
+    current = server.global_model.get_weights()
+    delta = [np.zeros((1, 1), dtype=np.float32)] + list(current[1:])
+    with pytest.raises(ValueError):
+        server.receive_update('c1', delta, {}, delta=True)
+    assert 'c1' not in server.client_updates
+
+
+def test_expire_drops_old_entries(tmp_path):
+    spool = UpdateSpool(str(tmp_path), max_age=3600)
+    spool.put([np.zeros(2, dtype=np.float32)], {}, None, base_round=1)
+    assert spool.expire() == 0 and len(spool) == 1
+
+    spool.max_age = 0
+    assert spool.expire() == 1 and len(spool) == 0
+
+
+class RejectingTransport:
+    def submit_encoded(self, client_id, blob):
+        raise ValueError('Update delta does not match the current global model')
+
+
+def test_offline_update_is_spooled_as_delta_and_dropped_when_rejected(tmp_path):
+    server, data_dir = fitted_server(tmp_path)
+    client = FederatedClient('http://127.0.0.1:9', data_dir, client_id='c1', spool_dir=str(tmp_path / 'spool'),
+                             model_backend='sklearn')
+    client.global_weights = server.global_model.get_weights()
+    client.local_model.set_weights(client.global_weights)
+    client.global_round = 3
+
+    client._spool_update(client.local_model.get_weights(), {'accuracy': 0.5})
+    _, blob = client.spool.newest()
+    weights, metadata = decode_update(blob)
+    assert metadata['delta'] and metadata['base_round'] == 3
+    assert np.allclose(weights[0], 0.0)
+
+    client.transport = RejectingTransport()
+    assert client.flush_spool() is None
+    assert len(client.spool) == 0
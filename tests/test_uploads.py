@@ -0,0 +1,83 @@
+# tests/test_uploads.py
+import os
+import json
+import pytest
+import requests
+from client.transport import HttpServerTransport
+from server.uploads import UploadManager, UploadError
+from utils import communication
+
+
+def test_new_upload_replaces_clients_oldest_session(tmp_path):
+    uploads = UploadManager(str(tmp_path), max_sessions_per_client=2)
+    first = uploads.initiate('c1', 10, 'a')['upload_id']
+    second = uploads.initiate('c1', 10, 'b')['upload_id']
+    third = uploads.initiate('c1', 10, 'c')['upload_id']
+
+    assert set(uploads.sessions) == {second, third}
+    assert not os.path.exists(uploads._path(first))
+
+
+def test_total_session_cap(tmp_path):
+    uploads = UploadManager(str(tmp_path), max_sessions=2)
+    uploads.initiate('c1', 10, 'a')
+    uploads.initiate('c2', 10, 'b')
+    with pytest.raises(UploadError) as error:
+        uploads.initiate('c3', 10, 'c')
+    assert error.value.status_code == 503
+    assert len(os.listdir(str(tmp_path))) == 2
+
+
+def test_abandoned_sessions_expire(tmp_path):
+    uploads = UploadManager(str(tmp_path), session_ttl=60)
+    upload_id = uploads.initiate('c1', 10, 'a')['upload_id']
+    uploads.sessions[upload_id]['updated_at'] -= 61
+
+    uploads.expire_stale()
+    assert upload_id not in uploads.sessions
+    assert not os.path.exists(uploads._path(upload_id))
+
+
+def test_leftover_part_files_removed_on_startup(tmp_path):
+    UploadManager(str(tmp_path)).initiate('c1', 10, 'a')
+    UploadManager(str(tmp_path))
+    assert os.listdir(str(tmp_path)) == []
+
+
+class FakeHttp:
+    """Answers upload requests with fixed status codes, recording the paths"""
+
+    def __init__(self, commit_status):
+        self.commit_status = commit_status
+        self.calls = []
+
+    def _response(self, path, status_code, body):
+        self.calls.append(path)
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = json.dumps(body).encode('utf-8')
+        response.url = path
+        return response
+
+    def post(self, path, **kwargs):
+        if path == '/upload/initiate':
+            return self._response(path, 200, {'upload_id': 'u1', 'offset': 0, 'chunk_size': 4})
+        return self._response(path, self.commit_status, {'status': 'error'})
+
+    def get(self, path, **kwargs):
+        return self._response(path, 200, {'upload_id': 'u1', 'offset': 10, 'chunk_size': 4})
+
+    def put(self, path, params=None, **kwargs):
+        return self._response(path, 200, {'offset': params['offset'] + len(kwargs['data'])})
+
+
+@pytest.mark.parametrize('commit_status, attempts', [(422, 1), (400, 1), (404, 3), (500, 3)])
+def test_only_transient_upload_errors_are_retried(monkeypatch, commit_status, attempts):
+    monkeypatch.setattr(communication.time, 'sleep', lambda seconds: None)
+    transport = HttpServerTransport('http://server.invalid', upload_attempts=3)
+    transport.http = FakeHttp(commit_status)
+
+    with pytest.raises(requests.HTTPError) as error:
+        transport.submit_encoded('c1', b'0123456789')
+    assert error.value.response.status_code == commit_status
+    assert transport.http.calls.count('/upload/u1/commit') == attempts
@@ -0,0 +1,358 @@
+# utils/communication.py
+import io
+import json
+import time
+import random
+import hashlib
+import threading
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+# Precision policy: model parameters are float32 on clients, on the server
+# and in checkpoints, and may be narrowed to float16 on the wire. Only the
+# aggregator accumulates in float64.
+PARAM_DTYPE = np.float32
+WIRE_DTYPES = {'float32': np.float32, 'float16': np.float16}
+
+
+def cast_floating(array, dtype):
+    """Cast a floating-point array to dtype; other arrays are returned as is"""
+    array = np.asarray(array)
+    if np.issubdtype(array.dtype, np.floating) and array.dtype != dtype:
+        return array.astype(dtype)
+    return array
+
+
+def to_param_dtype(weights):
+    """Cast the floating-point arrays of a weight list to PARAM_DTYPE"""
+    return [cast_floating(w, PARAM_DTYPE) for w in weights]
+
+
+def weights_fingerprint(weights):
+    """Short content hash of a list of weight arrays
+    
+    Used to tell whether a model has changed without comparing the weights.
+    """
+    digest = hashlib.sha1()
+    for w in weights:
+        w = np.asarray(w)
+        if w.dtype == object:
+            w = w.astype(str)
+        digest.update(str(w.shape).encode('utf-8'))
+        digest.update(np.ascontiguousarray(w).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def weights_delta(weights, base):
+    """Difference of weights from base, for updates relative to a global model
+    
+    Numeric arrays are subtracted; other arrays (the vocabulary) are kept as
+    they are, so the receiver can check the delta was taken against a model
+    with the same features. Raises ValueError if the shapes differ.
+    """
+    if len(weights) != len(base):
+        raise ValueError('Weights and base have a different number of arrays')
+    delta = []
+    for w, b in zip(weights, base):
+        w, b = np.asarray(w), np.asarray(b)
+        if np.issubdtype(w.dtype, np.number):
+            if w.shape != b.shape:
+                raise ValueError(f"Shape {w.shape} does not match base shape {b.shape}")
+            delta.append((w.astype(np.float64) - b).astype(PARAM_DTYPE))
+        else:
+            delta.append(w)
+    return delta
+
+
+def apply_weights_delta(delta, base):
+    """Inverse of weights_delta: base plus delta, as PARAM_DTYPE"""
+    return [
+        (np.asarray(b, dtype=np.float64) + d).astype(PARAM_DTYPE) if np.issubdtype(np.asarray(d).dtype, np.number)
+        else np.asarray(b)
+        for d, b in zip(delta, base)
+    ]
+
+
+def encode_update(weights, metadata=None, wire_dtype='float32'):
+    """Pack weight arrays and JSON metadata into a compact binary blob
+    
+    The blob is an uncompressed .npz archive: one array per weight plus the
+    metadata as UTF-8 JSON. Floating-point weights are stored as wire_dtype
+    (a WIRE_DTYPES key). Object and string arrays (the vocabulary) are
+    stored as UTF-8 bytes so the blob can be loaded without pickle.
+    """
+    dtype = WIRE_DTYPES[wire_dtype]
+    arrays = {}
+    for i, w in enumerate(weights):
+        w = cast_floating(w, dtype)
+        if w.dtype == object or w.dtype.kind == 'U':
+            w = np.char.encode(w.astype(str), 'utf-8')
+        arrays[f"w{i}"] = w
+    arrays['metadata'] = np.frombuffer(json.dumps(metadata or {}).encode('utf-8'), dtype=np.uint8)
+    
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def decode_update(blob):
+    """Inverse of encode_update; blob may be bytes or a file path/object
+    
+    Floating-point weights are returned as PARAM_DTYPE whatever their
+    precision on the wire.
+    """
+    source = io.BytesIO(blob) if isinstance(blob, (bytes, bytearray, memoryview)) else blob
+    with np.load(source, allow_pickle=False) as archive:
+        metadata = json.loads(archive['metadata'].tobytes().decode('utf-8'))
+        num_weights = len(archive.files) - 1
+        weights = []
+        for i in range(num_weights):
+            w = archive[f"w{i}"]
+            if w.dtype.kind == 'S':
+                w = np.char.decode(w, 'utf-8')
+            weights.append(cast_floating(w, PARAM_DTYPE))
+    return weights, metadata
+
+
+def backoff_delay(attempt, base_delay=1.0, max_delay=30.0):
+    """Jittered exponential delay before retry number attempt + 1"""
+    delay = min(max_delay, base_delay * (2 ** attempt))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def retry_with_backoff(func, max_attempts=3, base_delay=1.0, max_delay=30.0, no_retry=()):
+    """Call func until it succeeds, sleeping with jittered exponential backoff
+    
+    Re-raises the last exception once max_attempts calls have failed, and
+    exceptions of the no_retry types immediately.
+    """
+    for attempt in range(max_attempts):
+        try:
+            return func()
+        except no_retry:
+            raise
+        except Exception:
+            if attempt == max_attempts - 1:
+                raise
+            time.sleep(backoff_delay(attempt, base_delay, max_delay))
+
+
+# (connect, read) timeouts in seconds by endpoint path prefix; the longest
+# matching prefix wins
+DEFAULT_TIMEOUTS = {
+    '/get_status': (3.05, 5),
+    '/heartbeat': (3.05, 5),
+    '/get_metrics': (3.05, 10),
+    '/start_round': (3.05, 10),
+    '/classify': (3.05, 10),
+    '/get_model': (3.05, 60),
+    '/upload': (3.05, 30),
+}
+DEFAULT_TIMEOUT = (3.05, 30)
+
+# Responses worth retrying: the server or a proxy in front of it was
+# briefly unavailable
+RETRY_STATUS_CODES = {502, 503, 504}
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised without contacting the server while its circuit is open"""
+
+
+class CircuitBreaker:
+    """Stops calls to a server that keeps failing
+    
+    After failure_threshold consecutive failures the circuit opens and
+    calls fail immediately. After reset_timeout seconds one trial call is
+    let through; its success closes the circuit, its failure reopens it.
+    """
+    
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+    
+    @property
+    def state(self):
+        with self.lock:
+            if self.opened_at is None:
+                return 'closed'
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+    
+    def allow(self):
+        """Whether a call may be made now"""
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+    
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+    
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class HttpTransport:
+    """Pooled HTTP access to one component (the server or a client API)
+    
+    Requests go through a keep-alive requests.Session, get a timeout for
+    their endpoint from DEFAULT_TIMEOUTS, are retried with jittered backoff
+    on connection errors, timeouts and 502/503/504 (idempotent methods
+    only, unless retry=True), and pass a circuit breaker. Per-endpoint
+    latency and connection reuse are reported by stats().
+    """
+    
+    def __init__(self, base_url, timeouts=None, max_attempts=3, base_delay=0.5, max_delay=10.0,
+                 pool_maxsize=10, failure_threshold=5, reset_timeout=30.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        
+        # Per-endpoint counters
+        self.lock = threading.Lock()
+        self.endpoint_stats = {}
+    
+    def endpoint(self, path):
+        """Longest configured prefix of path, used for timeouts and stats"""
+        matches = [prefix for prefix in self.timeouts if path.startswith(prefix)]
+        return max(matches, key=len) if matches else path
+    
+    def request(self, method, path, retry=None, **kwargs):
+        """Send a request to base_url + path and return the response
+        
+        Error statuses other than the retried ones are returned to the
+        caller; connection errors and timeouts are raised after the last
+        attempt, other request errors right away, and CircuitOpenError
+        while the circuit is open.
+        """
+        endpoint = self.endpoint(path)
+        kwargs.setdefault('timeout', self.timeouts.get(endpoint, DEFAULT_TIMEOUT))
+        if retry is None:
+            retry = method.upper() in ('GET', 'HEAD', 'PUT', 'DELETE')
+        attempts = self.max_attempts if retry else 1
+        
+        for attempt in range(attempts):
+            if attempt:
+                time.sleep(backoff_delay(attempt - 1, self.base_delay, self.max_delay))
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"Circuit open for {self.base_url}, not calling {path}")
+            
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, self.base_url + path, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self.breaker.record_failure()
+                self._record(endpoint, started, failed=True)
+                if attempt == attempts - 1:
+                    raise
+                continue
+            except Exception:
+                # Not retried (e.g. ChunkedEncodingError, InvalidURL), but
+                # still a failed call: a half-open trial has to end here, or
+                # the circuit would stay open for good
+                self.breaker.record_failure()
+                self._record(endpoint, started, failed=True)
+                raise
+            
+            failed = response.status_code >= 500
+            if failed:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            self._record(endpoint, started, failed)
+            
+            if response.status_code in RETRY_STATUS_CODES and attempt < attempts - 1:
+                continue
+            return response
+    
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+    
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+    
+    def put(self, path, **kwargs):
+        return self.request('PUT', path, **kwargs)
+    
+    def _record(self, endpoint, started, failed):
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            stats = self.endpoint_stats.setdefault(endpoint, {'requests': 0, 'errors': 0, 'total': 0.0, 'max': 0.0})
+            stats['requests'] += 1
+            stats['errors'] += int(failed)
+            stats['total'] += elapsed
+            stats['max'] = max(stats['max'], elapsed)
+    
+    def stats(self):
+        """Connection reuse, circuit state and per-endpoint latency"""
+        # urllib3 counts the connections each pool opened and the requests
+        # it served; the difference are requests on reused connections
+        new_connections = 0
+        pooled_requests = 0
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    new_connections += pool.num_connections
+                    pooled_requests += pool.num_requests
+        
+        with self.lock:
+            endpoints = {
+                endpoint: {
+                    'requests': stats['requests'],
+                    'errors': stats['errors'],
+                    'avg_ms': 1000.0 * stats['total'] / stats['requests'],
+                    'max_ms': 1000.0 * stats['max']
+                }
+                for endpoint, stats in sorted(self.endpoint_stats.items())
+            }
+        
+        return {
+            'base_url': self.base_url,
+            'requests': pooled_requests,
+            'new_connections': new_connections,
+            'connection_reuse_rate': 1.0 - new_connections / pooled_requests if pooled_requests else 0.0,
+            'circuit': self.breaker.state,
+            'endpoints': endpoints
+        }
+
+
+_transports = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(base_url):
+    """Shared HttpTransport for base_url, so components in one process
+    talking to the same server share its connection pool and circuit"""
+    base_url = base_url.rstrip('/')
+    with _transports_lock:
+        transport = _transports.get(base_url)
+        if transport is None:
+            transport = _transports[base_url] = HttpTransport(base_url)
+        return transport
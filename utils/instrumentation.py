@@ -0,0 +1,213 @@
+# utils/instrumentation.py
+# Counters and timing histograms, exported in the Prometheus text format.
+# Metrics are created once at import time (counter() and histogram() return
+# the existing metric for a name already registered) and are cheap to
+# record: a histogram observation is a bisect and a few additions under a
+# lock. Recording can be switched off with the FL_METRICS=0 environment
+# variable or set_enabled(False); timers then do not even read the clock.
+import os
+import time
+import bisect
+import threading
+
+# Upper bounds in seconds of the latency buckets; Prometheus adds +Inf
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_enabled = os.environ.get('FL_METRICS', '1').lower() not in ('0', 'false', 'no', 'off')
+
+
+def enabled():
+    """Whether metrics are being recorded"""
+    return _enabled
+
+
+def set_enabled(value):
+    """Turn recording of all metrics on or off"""
+    global _enabled
+    _enabled = bool(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(label_names, label_values, extra=None):
+    pairs = list(zip(label_names, label_values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonically increasing count, optionally per label values"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        if not _enabled:
+            return
+        key = tuple(labels[name] for name in self.label_names)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            values = sorted(self.values.items())
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+
+class _Timer:
+    """Context manager observing its elapsed time into a histogram"""
+
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class _NullTimer:
+    """Timer used while recording is off"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Histogram:
+    """Distribution of observed values in fixed buckets, optionally per label values"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Label values -> [per-bucket counts (last one is +Inf), sum, count]
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        if not _enabled:
+            return
+        key = tuple(labels[name] for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(self, **labels):
+        """Context manager timing its block, e.g. with STAGE_SECONDS.time(stage='fit'):"""
+        if not _enabled:
+            return _NULL_TIMER
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self.lock:
+            values = sorted((key, (list(state[0]), state[1], state[2])) for key, state in self.values.items())
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.label_names, key, ('le', _format_value(float(bound))))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.label_names, key)
+            yield f"{self.name}_sum{labels} {_format_value(float(total))}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class Registry:
+    """Named metrics of a process"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric '{name}' is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, help_text, label_names=()):
+        return self._get_or_create(Counter, name, help_text, label_names)
+
+    def histogram(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, label_names, buckets)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self.lock:
+            metrics = sorted(self.metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# Content type of render() output
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def counter(name, help_text, label_names=()):
+    """The process-wide counter called name, created on first use"""
+    return REGISTRY.counter(name, help_text, label_names)
+
+
+def histogram(name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+    """The process-wide histogram called name, created on first use"""
+    return REGISTRY.histogram(name, help_text, label_names, buckets)
+
+
+def render():
+    """All metrics of this process in the Prometheus text format"""
+    return REGISTRY.render()
+
+
+# Per-stage timings and counters of the client side, recorded by several
+# client modules and exported on the client API's /metrics
+CLIENT_STAGE_SECONDS = histogram('fl_client_stage_seconds', 'Time spent in each client stage', ['stage'])
+CLIENT_UPLOADED_BYTES = counter('fl_client_uploaded_bytes_total', 'Bytes of updates submitted')